@@ -1,16 +1,24 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
 import pdfplumber
 from pdf2image import convert_from_path
 from pdf2docx import Converter
 import re
+import bisect
 import csv
 import io
 import os
 import json
 from datetime import datetime
 from pathlib import Path
+from collections import OrderedDict
 import requests
 import time
+import random
+import hashlib
+import threading
+import sqlite3
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 try:
     # Optional: Unstract API deployments client
@@ -22,6 +30,13 @@ except Exception:
     APIDeploymentsClient = None
     APIDeploymentsClientException = Exception
 
+try:
+    # Optional: PyMuPDF reads page text much faster than pdfplumber
+    import fitz
+    HAS_PYMUPDF = True
+except ImportError:
+    HAS_PYMUPDF = False
+
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'outputs'
@@ -38,6 +53,19 @@ os.makedirs(os.path.join(app.config['OUTPUT_FOLDER'], 'documents'), exist_ok=Tru
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 OPENAI_API_BASE = os.environ.get("OPENAI_API_BASE", "https://api.openai.com/v1")
 OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4.1-mini")
+# Long sections are sent as chunks of at most AI_CHUNK_CHARS characters, split
+# on item boundaries, with up to AI_MAX_CONCURRENCY requests in flight
+AI_CHUNK_CHARS = int(os.environ.get("AI_CHUNK_CHARS", "8000"))
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "4"))
+AI_REQUEST_TIMEOUT_SECONDS = int(os.environ.get("AI_REQUEST_TIMEOUT_SECONDS", "60"))
+# 429/5xx answers and connection errors are retried with jittered exponential
+# backoff, up to AI_MAX_RETRIES times and within AI_REQUEST_DEADLINE_SECONDS
+# of the first attempt
+AI_MAX_RETRIES = int(os.environ.get("AI_MAX_RETRIES", "3"))
+AI_RETRY_BACKOFF_SECONDS = float(os.environ.get("AI_RETRY_BACKOFF_SECONDS", "0.5"))
+AI_RETRY_BACKOFF_MAX_SECONDS = float(os.environ.get("AI_RETRY_BACKOFF_MAX_SECONDS", "8"))
+AI_REQUEST_DEADLINE_SECONDS = float(os.environ.get("AI_REQUEST_DEADLINE_SECONDS", "180"))
+AI_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
 
 # --- Unstract configuration ---
 # UNSTRACT_API_URL should be the full Execution API URL for your deployment
@@ -48,6 +76,80 @@ UNSTRACT_TIMEOUT_SECONDS = int(os.environ.get("UNSTRACT_TIMEOUT_SECONDS", "300")
 UNSTRACT_POLL_INTERVAL_SECONDS = float(os.environ.get("UNSTRACT_POLL_INTERVAL_SECONDS", "2.5"))
 UNSTRACT_INCLUDE_METADATA = os.environ.get("UNSTRACT_INCLUDE_METADATA", "false").lower() == "true"
 
+# --- Page-sharded PDF text extraction ---
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "1"))
+PDF_MIN_PAGES_PER_WORKER = 8
+PDF_TEXT_BACKEND = "pymupdf" if HAS_PYMUPDF else "pdfplumber"
+
+# --- Section search ---
+SECTION_END_PATTERNS = [
+    re.compile(r'(?i)(?:appendix|appendices|index|acknowledgements|acknowledgments)'),
+    re.compile(r'(?i)(?:notes|footnotes|abstract|introduction)'),
+    re.compile(r'(?i)(?:chapter\s+\d+|section\s+\d+)'),
+]
+# An end marker this close to the start of the section is part of its heading
+SECTION_END_MIN_OFFSET = 100
+# Characters of already-read text searched again with each streamed page, so
+# a heading or end marker split across a page break is still found
+SECTION_STREAM_OVERLAP = 256
+NON_WHITESPACE = re.compile(r'\S')
+# Documents whose SectionIndex is kept for the next prompt against the same text
+SECTION_INDEX_CACHE_SIZE = int(os.environ.get("SECTION_INDEX_CACHE_SIZE", "8"))
+_section_indexes = OrderedDict()
+_section_index_lock = threading.Lock()
+
+# Bytes buffered before each chunk of a streamed CSV download is sent
+CSV_STREAM_CHUNK_BYTES = 64 * 1024
+
+# --- Extracted-text cache (content-addressed, LRU by size) ---
+# Bump TEXT_EXTRACTOR_VERSION whenever extract_text_from_pdf's output changes.
+# Keys also name PDF_TEXT_BACKEND, whose page text differs between backends.
+TEXT_EXTRACTOR_VERSION = "2"
+TEXT_CACHE_ENABLED = os.environ.get("TEXT_CACHE_ENABLED", "true").lower() == "true"
+TEXT_CACHE_DIR = os.environ.get("TEXT_CACHE_DIR", os.path.join("outputs", "text_cache"))
+TEXT_CACHE_MAX_BYTES = int(os.environ.get("TEXT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+TEXT_CACHE_STATS = {"hits": 0, "misses": 0}
+_cache_lock = threading.Lock()
+
+# --- AI/Unstract result cache (content-addressed, TTL, LRU by size) ---
+# Rows returned by the paid remote engines, keyed by the text or file they
+# parsed plus everything else that shapes the answer (see _result_cache_key).
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join("outputs", "result_cache"))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_STATS = {"hits": 0, "misses": 0}
+
+# --- Background job queue ---
+# Uploads submitted to /jobs/upload run on a bounded pool; when
+# JOB_WORKERS + JOB_QUEUE_SIZE jobs are in flight new ones get HTTP 429.
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "16"))
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join("outputs", "jobs.sqlite3"))
+JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", str(24 * 3600)))
+_job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+# Shared by all requests so AI_MAX_CONCURRENCY bounds the calls in flight overall
+_ai_executor = ThreadPoolExecutor(max_workers=max(1, AI_MAX_CONCURRENCY), thread_name_prefix="ai")
+AI_CALL_STATS = {"calls": 0, "retries": 0, "failures": 0, "latency_ms_total": 0.0}
+_ai_stats_lock = threading.Lock()
+
+
+def _make_ai_session():
+    """A keep-alive session whose pool holds a connection per concurrent AI call."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_maxsize=max(1, AI_MAX_CONCURRENCY),
+        max_retries=0,  # retried by _ai_post, within its deadline
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_ai_session = _make_ai_session()
+_jobs_lock = threading.Lock()
+_jobs_in_flight = 0
+
 
 def ai_parsing_enabled() -> bool:
     """Return True if AI parsing is configured (API key present)."""
@@ -58,64 +160,369 @@ def unstract_enabled() -> bool:
     """Return True if Unstract parsing is configured (env + package present)."""
     return bool(UNSTRACT_API_URL and UNSTRACT_API_DEPLOYMENT_KEY and APIDeploymentsClient is not None)
 
-def extract_text_from_pdf(pdf_path):
-    """Extract all text from PDF"""
-    pdf_text = ''
+def resolve_pdf_workers(value=None) -> int:
+    """Parse a worker count from a request value, falling back to PDF_WORKERS."""
+    try:
+        workers = int(value) if value not in (None, '') else PDF_WORKERS
+    except (TypeError, ValueError):
+        workers = PDF_WORKERS
+    return max(1, min(workers, os.cpu_count() or 1))
+
+
+def iter_page_texts(pdf_path, start=0, stop=None):
+    """
+    Yield the text of pages[start:stop] one page at a time, with PyMuPDF
+    when it is installed (no layout analysis needed), else pdfplumber.
+    """
+    if HAS_PYMUPDF:
+        with fitz.open(pdf_path) as doc:
+            stop = doc.page_count if stop is None else min(stop, doc.page_count)
+            for index in range(start, stop):
+                yield doc[index].get_text("text").rstrip('\n')
+        return
     with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                pdf_text += page_text + '\n'
-    return pdf_text
+        for page in pdf.pages[start:stop]:
+            yield page.extract_text()
+            page.close()
 
-def extract_section_by_prompt(pdf_text, section_prompt):
-    """Extract a specific section from PDF text based on user prompt"""
-    if not section_prompt or not section_prompt.strip():
-        return pdf_text  # Return full text if no prompt
-    
-    prompt_lower = section_prompt.lower().strip()
-    
-    # Create pattern from prompt (case insensitive)
+
+def _extract_page_texts(pdf_path, start=0, stop=None):
+    """Extract the text of pages[start:stop]; runs in a worker process when sharded."""
+    return list(iter_page_texts(pdf_path, start, stop))
+
+
+def get_pdf_page_count(pdf_path):
+    """Return the number of pages in a PDF."""
+    if HAS_PYMUPDF:
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def join_page_texts(page_texts):
+    """Join page texts into one document, one newline after each non-empty page."""
+    return ''.join(page_text + '\n' for page_text in page_texts if page_text)
+
+
+def extract_text_from_pdf(pdf_path, workers=1):
+    """Extract all text from PDF, optionally sharding pages across processes"""
+    page_texts = None
+    if workers > 1:
+        page_count = get_pdf_page_count(pdf_path)
+        shards = max(1, min(workers, page_count // PDF_MIN_PAGES_PER_WORKER))
+        if shards > 1:
+            size, extra = divmod(page_count, shards)
+            ranges, start = [], 0
+            for i in range(shards):
+                stop = start + size + (1 if i < extra else 0)
+                ranges.append((start, stop))
+                start = stop
+            with ProcessPoolExecutor(max_workers=shards) as pool:
+                futures = [pool.submit(_extract_page_texts, pdf_path, a, b) for a, b in ranges]
+                page_texts = [text for future in futures for text in future.result()]
+
+    if page_texts is None:
+        page_texts = iter_page_texts(pdf_path)
+    return join_page_texts(page_texts)
+
+def file_sha256(file_path):
+    """Hash a file's contents in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _disk_cache_get(directory, key):
+    """Read a JSON cache entry, refreshing its mtime for LRU eviction."""
+    path = os.path.join(directory, f"{key}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            value = json.load(f)
+        os.utime(path)
+        return value
+    except (OSError, ValueError):
+        return None
+
+
+def _disk_cache_put(directory, key, value, max_bytes):
+    """Write a JSON cache entry atomically, then evict oldest entries over max_bytes."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{key}.json")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith('.json'):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+    for _, size, old_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(old_path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _result_cache_key(engine, content_sha256, column_prompts, *variant):
+    """Key a remote parsing result by its input, column schema and engine settings."""
+    material = json.dumps([engine, content_sha256, column_prompts, *variant], sort_keys=True)
+    return f"{engine}-{hashlib.sha256(material.encode('utf-8')).hexdigest()}"
+
+
+def _result_cache_get(key):
+    """Return the cached rows for key, or None if missing or older than the TTL."""
+    cached = _disk_cache_get(RESULT_CACHE_DIR, key)
+    if cached is not None and time.time() - cached.get("created", 0) > RESULT_CACHE_TTL_SECONDS:
+        try:
+            os.remove(os.path.join(RESULT_CACHE_DIR, f"{key}.json"))
+        except OSError:
+            pass
+        cached = None
+    with _cache_lock:
+        RESULT_CACHE_STATS["hits" if cached is not None else "misses"] += 1
+    return cached["rows"] if cached is not None else None
+
+
+def _result_cache_put(key, rows):
+    _disk_cache_put(RESULT_CACHE_DIR, key, {"created": time.time(), "rows": rows}, RESULT_CACHE_MAX_BYTES)
+
+
+def extract_text_from_pdf_cached(pdf_path, workers=1):
+    """
+    extract_text_from_pdf behind a cache keyed by file SHA-256 + extractor version
+    and text backend.
+
+    Returns (text, cache_info) where cache_info reports this call's hit/miss
+    and the running counters, or None when the cache is disabled.
+    """
+    if not TEXT_CACHE_ENABLED:
+        return extract_text_from_pdf(pdf_path, workers), None
+
+    key, cached_text, cache_info = _text_cache_lookup(pdf_path)
+    if cached_text is not None:
+        return cached_text, cache_info
+
+    pdf_text = extract_text_from_pdf(pdf_path, workers)
+    if pdf_text:
+        _disk_cache_put(TEXT_CACHE_DIR, key, {"text": pdf_text}, TEXT_CACHE_MAX_BYTES)
+    return pdf_text, cache_info
+
+
+def _text_cache_lookup(pdf_path):
+    """Look a PDF up in the text cache: (key, cached text or None, cache_info)."""
+    key = f"{file_sha256(pdf_path)}-v{TEXT_EXTRACTOR_VERSION}-{PDF_TEXT_BACKEND}"
+    cached = _disk_cache_get(TEXT_CACHE_DIR, key)
+    with _cache_lock:
+        TEXT_CACHE_STATS["hits" if cached is not None else "misses"] += 1
+        cache_info = {"hit": cached is not None, **TEXT_CACHE_STATS}
+    return key, (cached["text"] if cached is not None else None), cache_info
+
+
+def extract_section_from_pdf(pdf_path, section_prompt):
+    """
+    Find the prompt's section while reading the PDF page by page, stopping
+    once the section has ended (see extract_section_from_pages).
+
+    Returns (section_text, pdf_text, cache_info, pages_read). A cached text
+    is used when there is one; a read that stopped early is not cached.
+    """
+    key = cache_info = None
+    if TEXT_CACHE_ENABLED:
+        key, cached_text, cache_info = _text_cache_lookup(pdf_path)
+        if cached_text is not None:
+            return extract_section_by_prompt(cached_text, section_prompt), cached_text, cache_info, 0
+
+    pages = iter_page_texts(pdf_path)
+    try:
+        section_text, pdf_text, pages_read = extract_section_from_pages(pages, section_prompt)
+    finally:
+        pages.close()
+
+    if key and pdf_text and pages_read == get_pdf_page_count(pdf_path):
+        _disk_cache_put(TEXT_CACHE_DIR, key, {"text": pdf_text}, TEXT_CACHE_MAX_BYTES)
+    return section_text, pdf_text, cache_info, pages_read
+
+def _section_heading_pattern(section_prompt):
+    """Compile the prompt into the case-insensitive heading pattern."""
     # Escape special regex characters but allow flexibility
-    prompt_pattern = re.escape(prompt_lower)
+    prompt_pattern = re.escape(section_prompt.lower().strip())
     # Allow variations like "references", "reference", "bibliography"
     prompt_pattern = prompt_pattern.replace(r'\ ', r'\s+')
-    
-    # Try exact match first
-    pattern = rf'(?i)(?:{prompt_pattern})'
-    match = re.search(pattern, pdf_text)
-    
-    if not match:
-        # Try partial match - look for keywords
-        keywords = prompt_lower.split()
-        if len(keywords) > 0:
-            # Try to find section starting with any keyword
-            for keyword in keywords:
-                pattern = rf'(?i)\b{re.escape(keyword)}\b'
-                match = re.search(pattern, pdf_text)
-                if match:
+    return re.compile(rf'(?i)(?:{prompt_pattern})')
+
+
+class SectionIndex:
+    """
+    Heading and end-marker positions in one document's text, kept so that
+    later prompts against the same text reuse the searches made for earlier
+    ones.
+
+    Headings are found with one forward search per prompt (and per keyword
+    of the fallback) and remembered. Each end pattern is scanned forward
+    only as far as a lookup needs, so the matches already seen are answered
+    by bisection. Nothing past the section is copied.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self._headings = {}
+        self._keywords = {}
+        self._end_scans = [pattern.finditer(text) for pattern in SECTION_END_PATTERNS]
+        self._end_starts = [[] for _ in SECTION_END_PATTERNS]
+        self._end_stops = [[] for _ in SECTION_END_PATTERNS]
+        self._lock = threading.Lock()
+
+    def heading_end(self, section_prompt):
+        """Offset just past the prompt's heading, or None if it is not found."""
+        prompt = section_prompt.lower().strip()
+        if prompt not in self._headings:
+            match = _section_heading_pattern(section_prompt).search(self.text)
+            if match:
+                self._headings[prompt] = match.end()
+            else:
+                # Fall back to the first keyword found anywhere
+                self._headings[prompt] = None
+                for keyword in prompt.split():
+                    if keyword not in self._keywords:
+                        match = re.search(rf'(?i)\b{re.escape(keyword)}\b', self.text)
+                        self._keywords[keyword] = match.end() if match else None
+                    if self._keywords[keyword] is not None:
+                        self._headings[prompt] = self._keywords[keyword]
+                        break
+        return self._headings[prompt]
+
+    def end_marker(self, index, pos):
+        """Start of the first match of end pattern ``index`` at or after pos."""
+        starts, stops = self._end_starts[index], self._end_stops[index]
+        if not starts or starts[-1] < pos:
+            for match in self._end_scans[index]:
+                starts.append(match.start())
+                stops.append(match.end())
+                if match.start() >= pos:
                     break
-    
-    if match:
-        start_pos = match.end()
-        section_text = pdf_text[start_pos:].strip()
-        
-        # Try to find where section ends
-        end_patterns = [
-            r'(?i)(?:appendix|appendices|index|acknowledgements|acknowledgments)',
-            r'(?i)(?:notes|footnotes|abstract|introduction)',
-            r'(?i)(?:chapter\s+\d+|section\s+\d+)'
-        ]
-        
-        end_pos = len(section_text)
-        for pattern in end_patterns:
-            match = re.search(pattern, section_text)
-            if match and match.start() > 100:  # Only if it's not too close to start
-                end_pos = min(end_pos, match.start())
-        
-        return section_text[:end_pos].strip()
-    
-    return None
+        i = bisect.bisect_left(starts, pos)
+        if i and stops[i - 1] > pos:
+            # pos falls inside a scanned match; a shorter match may start
+            # within it, but none starts between it and the next one
+            match = SECTION_END_PATTERNS[index].search(self.text, pos)
+            return match.start() if match else None
+        return starts[i] if i < len(starts) else None
+
+    def section(self, section_prompt):
+        """The prompt's section text, or None if no heading matches."""
+        with self._lock:
+            heading_end = self.heading_end(section_prompt)
+            if heading_end is None:
+                return None
+            match = NON_WHITESPACE.search(self.text, heading_end)
+            start = match.start() if match else len(self.text)
+            end = len(self.text)
+            for index in range(len(SECTION_END_PATTERNS)):
+                marker = self.end_marker(index, start)
+                if marker is not None and marker - start > SECTION_END_MIN_OFFSET:
+                    end = min(end, marker)
+        return self.text[start:end].strip()
+
+
+def section_index(pdf_text):
+    """The SectionIndex for pdf_text, shared by the documents searched most recently."""
+    with _section_index_lock:
+        index = _section_indexes.pop(pdf_text, None)
+        if index is None:
+            index = SectionIndex(pdf_text)
+        _section_indexes[pdf_text] = index
+        while len(_section_indexes) > SECTION_INDEX_CACHE_SIZE:
+            _section_indexes.popitem(last=False)
+    return index
+
+
+def extract_section_by_prompt(pdf_text, section_prompt):
+    """Extract a specific section from PDF text based on user prompt"""
+    if not section_prompt or not section_prompt.strip():
+        return pdf_text  # Return full text if no prompt
+    return section_index(pdf_text).section(section_prompt)
+
+
+def extract_section_from_pages(page_texts, section_prompt):
+    """
+    extract_section_by_prompt over page texts that are read only as far as
+    needed. Pages stop being pulled once the heading and the end marker
+    that closes the section have both been seen, with SECTION_STREAM_OVERLAP
+    characters past the marker. The search then runs once on the text read,
+    so the result is the same as on the whole document.
+
+    Returns (section_text, pdf_text, pages_read) where pdf_text is the text
+    read so far. When the exact heading never appears the whole document
+    is read, since the keyword fallback needs all of it.
+    """
+    heading = _section_heading_pattern(section_prompt)
+    parts = []
+    length = 0  # characters read so far
+    recent, recent_start = '', 0  # tail of the text read so far and its offset
+    heading_end = section_start = None
+    end_starts = [None] * len(SECTION_END_PATTERNS)  # first match per end pattern
+    pages_read = 0
+
+    for page_text in page_texts:
+        pages_read += 1
+        if not page_text:
+            continue
+        part = page_text + '\n'
+        parts.append(part)
+        length += len(part)
+        recent += part
+
+        if heading_end is None:
+            match = heading.search(recent)
+            if match:
+                heading_end = recent_start + match.end()
+        if heading_end is not None and section_start is None:
+            match = NON_WHITESPACE.search(recent, max(0, heading_end - recent_start))
+            if match:
+                section_start = recent_start + match.start()
+        if section_start is not None:
+            pos = max(0, section_start - recent_start)
+            for i, pattern in enumerate(SECTION_END_PATTERNS):
+                if end_starts[i] is None:
+                    match = pattern.search(recent, pos)
+                    if match:
+                        end_starts[i] = recent_start + match.start()
+            ends = [start for start in end_starts
+                    if start is not None and start - section_start > SECTION_END_MIN_OFFSET]
+            # Any end marker still unseen would start after this one
+            if ends and min(ends) + SECTION_STREAM_OVERLAP <= length:
+                break
+
+        if len(recent) > SECTION_STREAM_OVERLAP:
+            recent_start += len(recent) - SECTION_STREAM_OVERLAP
+            recent = recent[-SECTION_STREAM_OVERLAP:]
+
+    pdf_text = ''.join(parts)
+    return extract_section_by_prompt(pdf_text, section_prompt), pdf_text, pages_read
+
+def _is_new_item(line, current_item):
+    """Heuristic: does this stripped line start a new item after current_item?"""
+    return bool(
+        re.match(r'^\d+[\.\)]\s+', line) or  # Numbered item
+        re.match(r'^[A-Z][a-z]+', line) or  # Starts with capital
+        (current_item and len(current_item) > 150)  # Previous item seems complete
+    )
+
 
 def parse_data_by_columns(text, column_prompts):
     """Parse text into columns based on user-defined prompts"""
@@ -133,14 +540,7 @@ def parse_data_by_columns(text, column_prompts):
         if not line:
             continue
         
-        # Determine if this is a new item (heuristic)
-        is_new_item = (
-            re.match(r'^\d+[\.\)]\s+', line) or  # Numbered item
-            re.match(r'^[A-Z][a-z]+', line) or  # Starts with capital
-            (current_item and len(current_item) > 150)  # Previous item seems complete
-        )
-        
-        if is_new_item and current_item:
+        if _is_new_item(line, current_item) and current_item:
             # Parse the previous item
             parsed = parse_item_by_columns(current_item, column_prompts)
             if parsed:
@@ -161,16 +561,243 @@ def parse_data_by_columns(text, column_prompts):
     return parsed_data
 
 
-def ai_parse_data(section_text, column_prompts, ai_instructions: str | None = None):
+def split_text_into_chunks(text, max_chars=AI_CHUNK_CHARS):
+    """
+    Split text into chunks of at most max_chars characters without cutting
+    an item in two, using the same item boundaries as parse_data_by_columns.
+    An item longer than max_chars is split on its own.
+    """
+    items = []
+    current_item = ''
+    for line in re.split(r'\n+', text):
+        line = line.strip()
+        if not line:
+            continue
+        if _is_new_item(line, current_item) and current_item:
+            items.append(current_item)
+            current_item = line
+        else:
+            current_item = f"{current_item}\n{line}" if current_item else line
+    if current_item:
+        items.append(current_item)
+
+    chunks = []
+    current_chunk = ''
+    for item in items:
+        if current_chunk and len(current_chunk) + 1 + len(item) > max_chars:
+            chunks.append(current_chunk)
+            current_chunk = ''
+        while len(item) > max_chars:
+            chunks.append(item[:max_chars])
+            item = item[max_chars:]
+        current_chunk = f"{current_chunk}\n{item}" if current_chunk else item
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def _ai_post(payload, metrics=None):
+    """
+    POST a chat completion through the shared session and return its JSON.
+
+    429/5xx answers and connection errors are retried after a jittered
+    exponential backoff (at least any Retry-After), until AI_MAX_RETRIES
+    retries are used or the next attempt would pass the deadline; the last
+    error is then raised. Each call's latency and retries are added to
+    AI_CALL_STATS and, if given, to the per-request metrics dict.
+    """
+    headers = {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    started = time.monotonic()
+    deadline = started + AI_REQUEST_DEADLINE_SECONDS
+    retries = 0
+    failed = True
+    try:
+        while True:
+            retry_after = None
+            try:
+                resp = _ai_session.post(
+                    f"{OPENAI_API_BASE}/chat/completions",
+                    headers=headers,
+                    json=payload,
+                    timeout=min(AI_REQUEST_TIMEOUT_SECONDS, deadline - time.monotonic()),
+                )
+                if resp.status_code in AI_RETRY_STATUSES:
+                    error = requests.HTTPError(f"{resp.status_code} from chat API", response=resp)
+                    retry_after = resp.headers.get("Retry-After")
+                else:
+                    resp.raise_for_status()
+                    data = resp.json()
+                    failed = False
+                    return data
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            delay = random.uniform(0, min(AI_RETRY_BACKOFF_MAX_SECONDS, AI_RETRY_BACKOFF_SECONDS * 2 ** retries))
+            try:
+                delay = max(delay, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+            if retries >= AI_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                raise error
+            retries += 1
+            time.sleep(delay)
+    finally:
+        latency_ms = (time.monotonic() - started) * 1000
+        with _ai_stats_lock:
+            for stats in (AI_CALL_STATS, metrics):
+                if stats is None:
+                    continue
+                stats["calls"] += 1
+                stats["retries"] += retries
+                stats["failures"] += failed
+            AI_CALL_STATS["latency_ms_total"] += latency_ms
+            if metrics is not None:
+                metrics["latency_ms"].append(round(latency_ms, 1))
+
+
+def _ai_parse_chunk(chunk, column_prompts, ai_instructions=None, metrics=None):
+    """Send one chunk to the chat API; return its normalized rows, or None on failure."""
+    # Build a compact schema description for the model
+    columns_desc = []
+    for col in column_prompts:
+        name = col.get("name", "")
+        col_type = col.get("type", "text")
+        pattern = col.get("pattern", "")
+        desc_parts = [f"name: {name}", f"type: {col_type}"]
+        if pattern:
+            desc_parts.append(f"regex_hint: {pattern}")
+        columns_desc.append(" - " + ", ".join(desc_parts))
+
+    system_prompt = (
+        "You are an expert document parsing engine. "
+        "Given raw text from a PDF section and a list of target columns, "
+        "you extract a list of rows as strict JSON. "
+        "Each row MUST be a JSON object with exactly the specified column names as keys. "
+        "Return ONLY a JSON array or an object with a 'rows' array, with no extra text."
+    )
+
+    user_prompt_parts = [
+        "Parse the following text into rows.",
+        "",
+        "Columns schema:",
+        *columns_desc,
+        "",
+        "Text to parse:",
+        chunk,
+    ]
+
+    if ai_instructions:
+        user_prompt_parts.insert(
+            1,
+            f"Additional instructions from the user: {ai_instructions}",
+        )
+
+    user_prompt = "\n".join(user_prompt_parts)
+
+    payload = {
+        "model": OPENAI_MODEL,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        "temperature": 0.1,
+    }
+
+    try:
+        data = _ai_post(payload, metrics)
+        content = data["choices"][0]["message"]["content"]
+
+        # Expect either a list or an object with a "rows" field
+        parsed = json.loads(content)
+        if isinstance(parsed, list):
+            rows = parsed
+        elif isinstance(parsed, dict) and isinstance(parsed.get("rows"), list):
+            rows = parsed["rows"]
+        else:
+            return None
+
+        # Ensure rows are dicts with the expected keys
+        normalized_rows = []
+        col_names = [c.get("name", "") for c in column_prompts]
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            normalized = {name: (row.get(name) or "") for name in col_names if name}
+            if any(normalized.values()):
+                normalized_rows.append(normalized)
+
+        return normalized_rows
+    except Exception:
+        return None
+
+
+def ai_parse_data(section_text, column_prompts, ai_instructions: str | None = None,
+                  metrics: dict | None = None, use_cache: bool = True):
     """
     Use an LLM to parse section_text into structured rows based on column_prompts.
 
     This assumes an OpenAI-compatible chat API. To use a fine-tuned model,
     set OPENAI_MODEL (and optionally OPENAI_API_BASE) to point to it.
+
+    The text is split into chunks on item boundaries (split_text_into_chunks)
+    which are parsed concurrently; their rows are merged in order with exact
+    duplicates dropped. If any chunk fails, None is returned so the caller
+    falls back to rule-based parsing rather than returning partial rows.
+
+    `metrics`, if given, must hold "calls", "retries", "failures" and a
+    "latency_ms" list; each chat API call made for this text is added to it.
+
+    Results are kept in the result cache; use_cache=False skips the lookup
+    (the fresh rows still replace the cached ones).
     """
     if not ai_parsing_enabled():
         return None
 
+    cache_key = None
+    if RESULT_CACHE_ENABLED:
+        cache_key = _result_cache_key(
+            "ai",
+            hashlib.sha256(section_text.encode('utf-8')).hexdigest(),
+            column_prompts,
+            OPENAI_MODEL,
+            OPENAI_API_BASE,
+            ai_instructions or "",
+        )
+        cached_rows = _result_cache_get(cache_key) if use_cache else None
+        if metrics is not None:
+            metrics["cached"] = cached_rows is not None
+        if cached_rows is not None:
+            return cached_rows
+
+    chunks = split_text_into_chunks(section_text)
+    if len(chunks) == 1:
+        results = [_ai_parse_chunk(chunks[0], column_prompts, ai_instructions, metrics)]
+    else:
+        futures = [
+            _ai_executor.submit(_ai_parse_chunk, chunk, column_prompts, ai_instructions, metrics)
+            for chunk in chunks
+        ]
+        results = [future.result() for future in futures]
+
+    merged_rows = []
+    seen = set()
+    for rows in results:
+        if rows is None:
+            # On any failure, fall back to rule-based parsing
+            return None
+        for row in rows:
+            key = tuple(str(v) for v in row.values())
+            if key not in seen:
+                seen.add(key)
+                merged_rows.append(row)
+
+    if cache_key and merged_rows:
+        _result_cache_put(cache_key, merged_rows)
+    return merged_rows or None
+
 
 def _normalize_key(s: str) -> str:
     return re.sub(r"[^a-z0-9]+", "", (s or "").strip().lower())
@@ -265,16 +892,34 @@ def _extract_unstract_output(extraction_result):
     return None
 
 
-def unstract_parse_file_to_rows(file_path: str, column_prompts, custom_data: dict | None = None):
+def unstract_parse_file_to_rows(file_path: str, column_prompts, custom_data: dict | None = None,
+                                use_cache: bool = True):
     """
     Send the file to Unstract API Deployment and return parsed rows mapped to column_prompts.
 
     This expects you have created an Unstract API Deployment (Prompt Studio exported tool)
-    that returns structured JSON.
+    that returns structured JSON. Results are kept in the result cache, keyed by the
+    file's bytes; use_cache=False skips the lookup.
     """
     if not unstract_enabled():
         return None, "Unstract is not configured. Set UNSTRACT_API_URL and UNSTRACT_API_DEPLOYMENT_KEY and install unstract-client."
 
+    if RESULT_CACHE_ENABLED:
+        cache_key = _result_cache_key(
+            "unstract", file_sha256(file_path), column_prompts, UNSTRACT_API_URL, custom_data or {},
+        )
+        cached_rows = _result_cache_get(cache_key) if use_cache else None
+        if cached_rows is not None:
+            return cached_rows, None
+        rows, err = _unstract_parse_file_to_rows(file_path, column_prompts, custom_data)
+        if rows:
+            _result_cache_put(cache_key, rows)
+        return rows, err
+    return _unstract_parse_file_to_rows(file_path, column_prompts, custom_data)
+
+
+def _unstract_parse_file_to_rows(file_path, column_prompts, custom_data=None):
+    """Run the Unstract deployment on the file; returns (rows, error)."""
     try:
         adc = APIDeploymentsClient(
             api_url=UNSTRACT_API_URL,
@@ -330,92 +975,6 @@ def unstract_parse_file_to_rows(file_path: str, column_prompts, custom_data: dic
     except Exception as e:
         return None, f"Unstract integration failed: {str(e)}"
 
-    # Build a compact schema description for the model
-    columns_desc = []
-    for col in column_prompts:
-        name = col.get("name", "")
-        col_type = col.get("type", "text")
-        pattern = col.get("pattern", "")
-        desc_parts = [f"name: {name}", f"type: {col_type}"]
-        if pattern:
-            desc_parts.append(f"regex_hint: {pattern}")
-        columns_desc.append(" - " + ", ".join(desc_parts))
-
-    system_prompt = (
-        "You are an expert document parsing engine. "
-        "Given raw text from a PDF section and a list of target columns, "
-        "you extract a list of rows as strict JSON. "
-        "Each row MUST be a JSON object with exactly the specified column names as keys. "
-        "Return ONLY a JSON array or an object with a 'rows' array, with no extra text."
-    )
-
-    user_prompt_parts = [
-        "Parse the following text into rows.",
-        "",
-        "Columns schema:",
-        *columns_desc,
-        "",
-        "Text to parse:",
-        section_text[:8000],  # safeguard: truncate very long text
-    ]
-
-    if ai_instructions:
-        user_prompt_parts.insert(
-            1,
-            f"Additional instructions from the user: {ai_instructions}",
-        )
-
-    user_prompt = "\n".join(user_prompt_parts)
-
-    payload = {
-        "model": OPENAI_MODEL,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        "temperature": 0.1,
-    }
-
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    try:
-        resp = requests.post(
-            f"{OPENAI_API_BASE}/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=60,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        content = data["choices"][0]["message"]["content"]
-
-        # Expect either a list or an object with a "rows" field
-        parsed = json.loads(content)
-        if isinstance(parsed, list):
-            rows = parsed
-        elif isinstance(parsed, dict) and isinstance(parsed.get("rows"), list):
-            rows = parsed["rows"]
-        else:
-            return None
-
-        # Ensure rows are dicts with the expected keys
-        normalized_rows = []
-        col_names = [c.get("name", "") for c in column_prompts]
-        for row in rows:
-            if not isinstance(row, dict):
-                continue
-            normalized = {name: (row.get(name) or "") for name in col_names if name}
-            if any(normalized.values()):
-                normalized_rows.append(normalized)
-
-        return normalized_rows or None
-    except Exception:
-        # On any failure, fall back to rule-based parsing
-        return None
-
 def parse_item_by_columns(item_text, column_prompts):
     """Parse a single item into columns based on prompts"""
     result = {}
@@ -512,6 +1071,103 @@ def extract_by_column_name(text, column_name, extraction_type):
     # Default: return empty or try to extract based on context
     return ''
 
+# --- Background jobs (bounded thread pool + SQLite job store) ---
+
+def _jobs_db():
+    return sqlite3.connect(JOB_DB_PATH, timeout=30)
+
+def _init_jobs_db():
+    with _jobs_db() as db:
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT, status TEXT,"
+            " created_at REAL, started_at REAL, finished_at REAL,"
+            " http_status INTEGER, result TEXT, error TEXT)"
+        )
+        # Jobs that were in flight when the previous process died
+        db.execute(
+            "UPDATE jobs SET status = 'failed', error = 'Interrupted by restart', "
+            "finished_at = ? WHERE status IN ('queued', 'running')", (time.time(),)
+        )
+
+def _update_job(job_id, **fields):
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with _jobs_db() as db:
+        db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+def submit_job(kind, func, *args, cleanup=None):
+    """
+    Queue func(*args) -> (body, status) on the job pool.
+
+    Returns the job id, or None when JOB_WORKERS + JOB_QUEUE_SIZE jobs are
+    already in flight. `cleanup` names a file to delete when the job ends.
+    """
+    global _jobs_in_flight
+    with _jobs_lock:
+        if _jobs_in_flight >= JOB_WORKERS + JOB_QUEUE_SIZE:
+            return None
+        _jobs_in_flight += 1
+
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    try:
+        with _jobs_db() as db:
+            db.execute("DELETE FROM jobs WHERE finished_at < ?", (now - JOB_TTL_SECONDS,))
+            db.execute("INSERT INTO jobs (id, kind, status, created_at) VALUES (?, ?, 'queued', ?)",
+                       (job_id, kind, now))
+        _job_executor.submit(_run_job, job_id, func, args, cleanup)
+    except Exception:
+        # The job will never run: give its slot (and its file) back
+        with _jobs_lock:
+            _jobs_in_flight -= 1
+        if cleanup and os.path.exists(cleanup):
+            os.remove(cleanup)
+        raise
+    return job_id
+
+def _run_job(job_id, func, args, cleanup):
+    global _jobs_in_flight
+    _update_job(job_id, status='running', started_at=time.time())
+    try:
+        body, http_status = func(*args)
+        _update_job(job_id, status='done' if http_status < 400 else 'failed',
+                    http_status=http_status, result=json.dumps(body),
+                    error=body.get('error'), finished_at=time.time())
+    except Exception as e:
+        body = {'error': f'Error processing PDF: {str(e)}'}
+        _update_job(job_id, status='failed', http_status=500, result=json.dumps(body),
+                    error=str(e), finished_at=time.time())
+    finally:
+        with _jobs_lock:
+            _jobs_in_flight -= 1
+        if cleanup and os.path.exists(cleanup):
+            try:
+                os.remove(cleanup)
+            except OSError:
+                pass
+
+def get_job(job_id):
+    with _jobs_db() as db:
+        db.row_factory = sqlite3.Row
+        row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def job_status_body(job):
+    """Public view of a job row (without its result payload)."""
+    return {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'error': job['error'],
+        'status_url': f"/jobs/{job['id']}",
+        'result_url': f"/jobs/{job['id']}/result"
+    }
+
+_init_jobs_db()
+
 def convert_pdf_to_images(pdf_path, output_dir):
     """Convert PDF pages to images"""
     try:
@@ -541,6 +1197,96 @@ def convert_pdf_to_docx(pdf_path, output_path):
 def index():
     return render_template('index.html')
 
+def parse_uploaded_pdf(filepath, form):
+    """
+    Run the /upload parsing pipeline on a PDF already saved to disk.
+
+    `form` holds the /upload form fields. Returns (body, status) so the
+    synchronous route and background jobs share one implementation.
+    """
+    section_prompt = (form.get('section_prompt') or '').strip()
+    column_prompts_json = form.get('column_prompts') or '[]'
+    use_ai = (form.get('use_ai') or 'false').lower() == 'true'
+    ai_instructions = (form.get('ai_instructions') or '').strip()
+    engine = (form.get('engine') or '').strip().lower()  # optional: rule | ai | unstract
+    workers = resolve_pdf_workers(form.get('workers'))
+    # Read pages only up to the end of the section instead of the whole PDF
+    stream_pages = (form.get('stream_pages') or 'false').lower() == 'true'
+    pages_read = None
+    ai_metrics = None
+    # use_cache=false re-runs the AI/Unstract engines instead of reusing a cached result
+    use_cache = (form.get('use_cache') or 'true').lower() == 'true'
+
+    try:
+        column_prompts = json.loads(column_prompts_json)
+    except:
+        column_prompts = []
+
+    # Choose engine:
+    # - unstract: send PDF to Unstract API deployment and use its structured JSON
+    # - ai/rule: extract text locally and parse
+    if engine == "unstract":
+        if not column_prompts:
+            return {'error': 'Unstract parsing requires at least one column definition (schema)'}, 400
+
+        parsed_data, err = unstract_parse_file_to_rows(filepath, column_prompts, use_cache=use_cache)
+        if err:
+            return {'error': err}, 400
+
+        section_text = ""  # not applicable for Unstract path
+        cache_info = None
+    else:
+        # Extract text from PDF
+        if section_prompt and stream_pages:
+            section_text, pdf_text, cache_info, pages_read = extract_section_from_pdf(filepath, section_prompt)
+        else:
+            pdf_text, cache_info = extract_text_from_pdf_cached(filepath, workers)
+
+        if not pdf_text:
+            return {'error': 'Could not extract text from PDF'}, 400
+
+        # Extract section based on prompt
+        if section_prompt:
+            if not stream_pages:
+                section_text = extract_section_by_prompt(pdf_text, section_prompt)
+            if not section_text:
+                return {'error': f'Could not find section matching "{section_prompt}"'}, 400
+        else:
+            section_text = pdf_text
+
+        # Parse data into columns
+        if column_prompts:
+            parsed_data = None
+
+            # Try AI-assisted parsing first if enabled and configured
+            if (engine == "ai" or use_ai) and ai_parsing_enabled():
+                ai_metrics = {"calls": 0, "retries": 0, "failures": 0, "latency_ms": []}
+                parsed_data = ai_parse_data(section_text, column_prompts, ai_instructions, ai_metrics, use_cache)
+
+            # Fallback to rule-based parsing
+            if not parsed_data:
+                parsed_data = parse_data_by_columns(section_text, column_prompts)
+        else:
+            # Default: return raw text split by lines
+            parsed_data = [{'Text': line.strip()} for line in section_text.split('\n') if line.strip()]
+
+    if not parsed_data:
+        return {'error': 'Could not parse any data from the PDF'}, 400
+
+    if ai_metrics is not None:
+        with _ai_stats_lock:
+            ai_metrics["totals"] = dict(AI_CALL_STATS)
+
+    return {
+        'success': True,
+        'data': parsed_data,
+        'count': len(parsed_data),
+        'cache': cache_info,
+        'pages_read': pages_read,
+        'ai': ai_metrics,
+        'preview_text': section_text[:500] + '...' if len(section_text) > 500 else section_text
+    }, 200
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -553,85 +1299,66 @@ def upload_file():
     if not file.filename.lower().endswith('.pdf'):
         return jsonify({'error': 'Please upload a PDF file'}), 400
     
+    filepath = None
     try:
-        # Get parsing configuration from request
-        section_prompt = request.form.get('section_prompt', '').strip()
-        column_prompts_json = request.form.get('column_prompts', '[]')
-        use_ai = request.form.get('use_ai', 'false').lower() == 'true'
-        ai_instructions = request.form.get('ai_instructions', '').strip()
-        engine = request.form.get('engine', '').strip().lower()  # optional: rule | ai | unstract
-        
-        try:
-            column_prompts = json.loads(column_prompts_json)
-        except:
-            column_prompts = []
-        
         # Save uploaded file temporarily
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
         file.save(filepath)
         
-        # Choose engine:
-        # - unstract: send PDF to Unstract API deployment and use its structured JSON
-        # - ai/rule: extract text locally and parse
-        if engine == "unstract":
-            if not column_prompts:
-                os.remove(filepath)
-                return jsonify({'error': 'Unstract parsing requires at least one column definition (schema)'}), 400
-
-            parsed_data, err = unstract_parse_file_to_rows(filepath, column_prompts)
-            if err:
-                os.remove(filepath)
-                return jsonify({'error': err}), 400
-
-            section_text = ""  # not applicable for Unstract path
-        else:
-            # Extract text from PDF
-            pdf_text = extract_text_from_pdf(filepath)
-
-            if not pdf_text:
-                os.remove(filepath)
-                return jsonify({'error': 'Could not extract text from PDF'}), 400
-
-            # Extract section based on prompt
-            if section_prompt:
-                section_text = extract_section_by_prompt(pdf_text, section_prompt)
-                if not section_text:
-                    os.remove(filepath)
-                    return jsonify({'error': f'Could not find section matching "{section_prompt}"'}), 400
-            else:
-                section_text = pdf_text
-
-            # Parse data into columns
-            if column_prompts:
-                parsed_data = None
-
-                # Try AI-assisted parsing first if enabled and configured
-                if (engine == "ai" or use_ai) and ai_parsing_enabled():
-                    parsed_data = ai_parse_data(section_text, column_prompts, ai_instructions)
-
-                # Fallback to rule-based parsing
-                if not parsed_data:
-                    parsed_data = parse_data_by_columns(section_text, column_prompts)
-            else:
-                # Default: return raw text split by lines
-                parsed_data = [{'Text': line.strip()} for line in section_text.split('\n') if line.strip()]
-        
-        if not parsed_data:
-            os.remove(filepath)
-            return jsonify({'error': 'Could not parse any data from the PDF'}), 400
-        
-        # Clean up temporary file
-        os.remove(filepath)
-        
-        return jsonify({
-            'success': True,
-            'data': parsed_data,
-            'count': len(parsed_data),
-            'preview_text': section_text[:500] + '...' if len(section_text) > 500 else section_text
-        })
+        body, status = parse_uploaded_pdf(filepath, request.form.to_dict())
+        return jsonify(body), status
     
     except Exception as e:
         return jsonify({'error': f'Error processing PDF: {str(e)}'}), 500
+    
+    finally:
+        # Clean up temporary file
+        if filepath and os.path.exists(filepath):
+            os.remove(filepath)
+
+@app.route('/jobs/upload', methods=['POST'])
+def submit_upload_job():
+    """Queue an /upload request; poll /jobs/<id> and fetch /jobs/<id>/result."""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No file selected'}), 400
+    
+    if not file.filename.lower().endswith('.pdf'):
+        return jsonify({'error': 'Please upload a PDF file'}), 400
+    
+    # Unique on-disk name: concurrent jobs may upload files with the same name
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{uuid.uuid4().hex}_{Path(file.filename).name}")
+    file.save(filepath)
+    
+    job_id = submit_job('upload', parse_uploaded_pdf, filepath, request.form.to_dict(), cleanup=filepath)
+    if job_id is None:
+        os.remove(filepath)
+        response = jsonify({'error': 'Job queue is full, retry later'})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    
+    return jsonify(job_status_body(get_job(job_id))), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job_status_body(job))
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Return the finished job's response body, or 202 while it is pending."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] in ('queued', 'running'):
+        return jsonify(job_status_body(job)), 202
+    return app.response_class(job['result'] or '{}', status=job['http_status'] or 500,
+                              mimetype='application/json')
 
 @app.route('/convert', methods=['POST'])
 def convert_pdf():
@@ -706,25 +1433,23 @@ def download_csv():
         else:
             fieldnames = ['Data']
     
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    
-    writer.writeheader()
-    for item in parsed_data:
-        row = {}
-        for field in fieldnames:
-            row[field] = item.get(field, '')
-        writer.writerow(row)
-    
-    output.seek(0)
+    # Stream the CSV in chunks instead of building the whole file in memory
+    def generate():
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer.writeheader()
+        for item in parsed_data:
+            writer.writerow({field: item.get(field, '') for field in fieldnames})
+            if output.tell() >= CSV_STREAM_CHUNK_BYTES:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
     
-    # Create response with CSV file
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
+    return Response(
+        generate(),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name='parsed_data.csv'
+        headers={'Content-Disposition': 'attachment; filename=parsed_data.csv'}
     )
 
 @app.route('/download_docx/<filename>')
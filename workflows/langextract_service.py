@@ -17,13 +17,24 @@ import traceback
 import gc
 import re
 import csv
-import io
-from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+import time
+import itertools
+import bisect
+import hashlib
+import threading
+import sqlite3
+import uuid
+import shutil
+import tempfile
+import zipfile
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator
+from datetime import datetime, date
 from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from enum import Enum
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from pydantic import BaseModel, Field, create_model
@@ -43,6 +54,15 @@ except ImportError:
     HAS_PDFPLUMBER = False
     print("Warning: pdfplumber not available")
 
+# Columnar export (Arrow IPC / Parquet output formats)
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 app = Flask(__name__)
 CORS(app)
 
@@ -178,6 +198,12 @@ class PromptAnalyzer:
             constraints=constraints
         )
     
+    def target_section(self, analysis: PromptAnalysis, section: str, prompt: str = "") -> PromptAnalysis:
+        """Point an analysis at an explicitly requested section."""
+        analysis.section_hint = section
+        analysis.section_type = self._determine_section_type(section, prompt)
+        return analysis
+    
     def _extract_columns(self, prompt: str) -> List[str]:
         """Extract column names from prompt."""
         columns = []
@@ -284,6 +310,12 @@ class PromptAnalyzer:
         if year_match:
             constraints['year_range'] = (int(year_match.group(1)), int(year_match.group(2)))
         
+        # Page range ("page 12", "pages 10-20")
+        page_match = re.search(r'\bpages?\s+(\d+)(?:\s*(?:[-–]|to)\s*(\d+))?', prompt, re.IGNORECASE)
+        if page_match:
+            first = int(page_match.group(1))
+            constraints['page_range'] = (first, int(page_match.group(2) or first))
+        
         # Limit
         limit_match = re.search(r'(?:limit|top|first)\s*(\d+)', prompt, re.IGNORECASE)
         if limit_match:
@@ -298,6 +330,83 @@ class PromptAnalyzer:
         return constraints
 
 
+# ============================================================
+# PROMPT PLAN CACHE
+# ============================================================
+
+PROMPT_CACHE_SIZE = int(os.environ.get('PROMPT_CACHE_SIZE', '256'))
+
+
+@dataclass
+class PromptPlan:
+    """
+    A prompt's analysis and the schema built from it. Shared between
+    requests by PromptCache, so treat it as read-only.
+    """
+    analysis: PromptAnalysis
+    column_names: List[str]
+    schema: 'ExtractionSchema'
+
+
+class PromptCache:
+    """
+    Bounded LRU of PromptPlans keyed by (prompt, columns, section).
+    
+    Clients reuse a small set of prompts; a hit skips prompt analysis and
+    schema construction entirely. Prompts are keyed with surrounding
+    whitespace stripped, which the analyzer ignores anyway.
+    """
+    
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._plans: 'OrderedDict[Tuple, PromptPlan]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, prompt: str, columns: Optional[List[str]] = None, section: str = "") -> PromptPlan:
+        """Plan for a prompt, with explicit columns and section if given."""
+        prompt = prompt.strip()
+        section = (section or "").strip()
+        key = (prompt, tuple(columns) if columns else None, section)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return plan
+            self.misses += 1
+        
+        analyzer = PromptAnalyzer()
+        analysis = analyzer.analyze(prompt)
+        if section:
+            analyzer.target_section(analysis, section, prompt)
+        column_names = list(columns) if columns else analysis.columns
+        plan = PromptPlan(analysis, column_names, ExtractionSchema(column_names))
+        
+        if self.max_entries > 0:
+            with self._lock:
+                self._plans[key] = plan
+                self._plans.move_to_end(key)
+                while len(self._plans) > self.max_entries:
+                    self._plans.popitem(last=False)
+        return plan
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._plans),
+                "max_entries": self.max_entries
+            }
+
+
+prompt_cache = PromptCache(PROMPT_CACHE_SIZE)
+
+
 # ============================================================
 # DOCUMENT STRUCTURE ANALYZER
 # ============================================================
@@ -313,6 +422,7 @@ class DocumentSection:
     end_char: int
     content: str = ""
     number: str = ""  # Chapter/section number (e.g., "1", "2.1", "IV")
+    end_page: int = 0
     subsections: List['DocumentSection'] = field(default_factory=list)
 
 
@@ -362,10 +472,37 @@ class DocumentStructureAnalyzer:
         (r'^\s*(#{3})\s+(.+?)\s*$', None, 3),
     ]
     
+    # Compiled once: per-pattern regexes, plus a single alternation of the
+    # whole grammar so non-heading lines are rejected in one match call.
+    # Alternation tries branches in order, so it agrees with the per-pattern
+    # loop on whether (and by which pattern first) a line matches.
+    COMPILED_PATTERNS = [(re.compile(pattern, re.IGNORECASE), pattern, section_type, level)
+                         for pattern, section_type, level in SECTION_PATTERNS]
+    HEADING_PREFILTER = re.compile(
+        '|'.join(f'(?:{pattern})' for pattern, _, _ in SECTION_PATTERNS), re.IGNORECASE)
+    
+    # Page markers written by extract_pdf_content
+    PAGE_MARKER = re.compile(r'^--- Page (\d+) ---$')
+    
     def __init__(self, text: str):
         self.text = text
         self.lines = text.split('\n')
         self.sections: List[DocumentSection] = []
+        
+        # Per-line start offset and page number, built in one pass so
+        # section positions are O(1) lookups
+        self.line_offsets: List[int] = []
+        self.line_pages: List[int] = []
+        pos = 0
+        page = 1
+        for line in self.lines:
+            if line.startswith('--- Page '):
+                marker = self.PAGE_MARKER.match(line)
+                if marker:
+                    page = int(marker.group(1))
+            self.line_offsets.append(pos)
+            self.line_pages.append(page)
+            pos += len(line) + 1
     
     def analyze(self) -> List[DocumentSection]:
         """Analyze document and extract section structure."""
@@ -376,8 +513,11 @@ class DocumentStructureAnalyzer:
             if not line:
                 continue
             
-            for pattern, section_type, level in self.SECTION_PATTERNS:
-                match = re.match(pattern, line, re.IGNORECASE)
+            if not self.HEADING_PREFILTER.match(line):
+                continue
+            
+            for regex, pattern, section_type, level in self.COMPILED_PATTERNS:
+                match = regex.match(line)
                 if match:
                     section = self._create_section(match, pattern, section_type, level, i)
                     if section:
@@ -432,20 +572,25 @@ class DocumentStructureAnalyzer:
             title = groups[1] if len(groups) > 1 else ""
             title = f"{number}. {title}" if number and title else title or number
         
-        # Calculate character position
-        char_pos = sum(len(self.lines[j]) + 1 for j in range(line_index))
+        char_pos = self.line_offsets[line_index]
         
         return DocumentSection(
             title=title.strip(),
             section_type=section_type,
             level=level,
-            start_page=1,
+            start_page=self.line_pages[line_index],
             start_char=char_pos,
             end_char=len(self.text),
             number=number
         )
     
-    def _classify_by_title(self, title: str) -> SectionType:
+    def page_at(self, char_pos: int) -> int:
+        """Return the page number containing a character offset."""
+        line_index = bisect.bisect_right(self.line_offsets, char_pos) - 1
+        return self.line_pages[max(line_index, 0)] if self.line_pages else 1
+    
+    @staticmethod
+    def _classify_by_title(title: str) -> SectionType:
         """Classify section type by title content."""
         title_lower = title.lower()
         
@@ -477,6 +622,7 @@ class DocumentStructureAnalyzer:
             end = self.sections[i + 1].start_char if i + 1 < len(self.sections) else len(self.text)
             section.content = self.text[start:end].strip()
             section.end_char = end
+            section.end_page = self.page_at(max(start, end - 1))
     
     def _build_hierarchy(self):
         """Build parent-child relationships between sections."""
@@ -490,37 +636,94 @@ class DocumentStructureAnalyzer:
     
     def find_section(self, query: str) -> Optional[DocumentSection]:
         """Find a section by title query."""
-        query_lower = query.lower().strip()
-        
-        # Direct match
-        for section in self.sections:
-            if query_lower in section.title.lower():
-                return section
-        
-        # Section type match
-        for section in self.sections:
-            if section.section_type.value in query_lower:
-                return section
-        
-        # Fuzzy match
-        for section in self.sections:
-            # Check if any word from query is in title
-            query_words = set(query_lower.split())
-            title_words = set(section.title.lower().split())
-            if query_words & title_words:
-                return section
-        
-        return None
+        return find_section_in(self.sections, query)
     
     def get_sections_by_type(self, section_type: SectionType) -> List[DocumentSection]:
         """Get all sections of a specific type."""
         return [s for s in self.sections if s.section_type == section_type]
 
 
+def find_section_in(sections: List[DocumentSection], query: str) -> Optional[DocumentSection]:
+    """Find a section by title query: direct, then by type, then fuzzy."""
+    query_lower = query.lower().strip()
+    
+    # Direct match
+    for section in sections:
+        if query_lower in section.title.lower():
+            return section
+    
+    # Section type match
+    for section in sections:
+        if section.section_type.value in query_lower:
+            return section
+    
+    # Fuzzy match
+    query_words = set(query_lower.split())
+    for section in sections:
+        # Check if any word from query is in title
+        title_words = set(section.title.lower().split())
+        if query_words & title_words:
+            return section
+    
+    return None
+
+
 # ============================================================
 # STRICT SCHEMA DEFINITIONS
 # ============================================================
 
+NUMBER_VALUE = re.compile(r'[\d,]+\.?\d*')
+YEAR_VALUE = re.compile(r'\b(19|20)\d{2}\b')
+EMAIL_VALUE = re.compile(r'\b([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})\b')
+ISO_DATE_VALUE = re.compile(r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})')
+US_DATE_VALUE = re.compile(r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})')
+
+
+def _validate_string(value: str) -> str:
+    return value
+
+
+def _validate_number(value: str) -> str:
+    match = NUMBER_VALUE.search(value)
+    return match.group(0).replace(',', '') if match else ""
+
+
+def _validate_year(value: str) -> str:
+    match = YEAR_VALUE.search(value)
+    return match.group(0) if match else ""
+
+
+def _validate_email(value: str) -> str:
+    match = EMAIL_VALUE.search(value)
+    return match.group(1) if match else ""
+
+
+def _validate_date(value: str) -> str:
+    """Normalize date to ISO format, falling back to the year or the value."""
+    match = ISO_DATE_VALUE.search(value)
+    if match:
+        return f"{match.group(1)}-{match.group(2).zfill(2)}-{match.group(3).zfill(2)}"
+    match = US_DATE_VALUE.search(value)
+    if match:
+        return f"{match.group(3)}-{match.group(1).zfill(2)}-{match.group(2).zfill(2)}"
+    match = YEAR_VALUE.search(value)
+    return match.group(0) if match else value
+
+
+# Values inspected by ColumnSchema.validate_values before deciding whether
+# memoizing repeated values pays off
+VALIDATION_MEMO_SAMPLE = 256
+
+# Value normalizers by ColumnSchema.data_type; values arrive stripped
+VALUE_VALIDATORS = {
+    'string': _validate_string,
+    'number': _validate_number,
+    'date': _validate_date,
+    'year': _validate_year,
+    'email': _validate_email,
+}
+
+
 @dataclass
 class ColumnSchema:
     """Defines a column with strict typing and validation."""
@@ -531,44 +734,40 @@ class ColumnSchema:
     required: bool = False
     patterns: List[str] = field(default_factory=list)
     
+    @property
+    def validator(self):
+        """The str -> str normalizer for this column's data type."""
+        return VALUE_VALIDATORS.get(self.data_type, _validate_string)
+    
     def validate_value(self, value: Any) -> str:
         """Validate and normalize a value for this column."""
         if value is None:
             return ""
-        
-        str_value = str(value).strip()
-        
-        if self.data_type == "number":
-            nums = re.findall(r'[\d,]+\.?\d*', str_value)
-            return nums[0].replace(',', '') if nums else ""
-        elif self.data_type == "date":
-            return self._normalize_date(str_value)
-        elif self.data_type == "year":
-            year_match = re.search(r'\b(19|20)\d{2}\b', str_value)
-            return year_match.group(0) if year_match else ""
-        elif self.data_type == "email":
-            email_match = re.search(r'\b([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})\b', str_value)
-            return email_match.group(1) if email_match else ""
-        
-        return str_value
+        return self.validator(str(value).strip())
     
-    def _normalize_date(self, value: str) -> str:
-        """Normalize date to ISO format."""
-        patterns = [
-            (r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})', lambda m: f"{m.group(1)}-{m.group(2).zfill(2)}-{m.group(3).zfill(2)}"),
-            (r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})', lambda m: f"{m.group(3)}-{m.group(1).zfill(2)}-{m.group(2).zfill(2)}"),
-        ]
-        
-        for pattern, formatter in patterns:
-            match = re.search(pattern, value, re.IGNORECASE)
-            if match:
-                try:
-                    return formatter(match)
-                except:
-                    pass
-        
-        year_match = re.search(r'\b(19|20)\d{2}\b', value)
-        return year_match.group(0) if year_match else value
+    def validate_values(self, values: Iterable[Any]) -> List[str]:
+        """
+        Validate a whole column of values at once. Empty cells are passed
+        through and repeated values are normalized only once.
+        """
+        validator = self.validator
+        values = ["" if v is None else str(v).strip() for v in values]
+        if validator is _validate_string:
+            return values
+        
+        # Memoize while values repeat (years, currencies); once the sample
+        # shows mostly distinct values the lookups only cost time
+        memo = {"": ""}
+        validated = []
+        for index, value in enumerate(values):
+            if index == VALIDATION_MEMO_SAMPLE and len(memo) > VALIDATION_MEMO_SAMPLE // 2:
+                validated.extend(validator(v) if v else "" for v in values[index:])
+                break
+            result = memo.get(value)
+            if result is None:
+                result = memo[value] = validator(value)
+            validated.append(result)
+        return validated
 
 
 class ExtractionSchema:
@@ -577,6 +776,14 @@ class ExtractionSchema:
     def __init__(self, column_names: List[str]):
         self.columns: List[ColumnSchema] = []
         self._build_schema(column_names)
+        self._plan: Optional['ExtractionPlan'] = None
+    
+    @property
+    def plan(self) -> 'ExtractionPlan':
+        """The schema's ExtractionPlan, compiled on first use."""
+        if self._plan is None:
+            self._plan = ExtractionPlan(self)
+        return self._plan
     
     def _build_schema(self, column_names: List[str]):
         """Build column schemas from names."""
@@ -632,38 +839,296 @@ class ExtractionSchema:
         return [col.name for col in self.columns]
     
     def create_record(self, data: Dict[str, Any] = None) -> Dict[str, str]:
-        if data is None:
-            data = {}
+        if not data:
+            # Empty cells are already normalized for every data type
+            return dict.fromkeys(self.get_headers(), "")
         record = {}
         for col in self.columns:
             raw_value = data.get(col.normalized_name, data.get(col.name, ""))
             record[col.normalized_name] = col.validate_value(raw_value)
         return record
     
-    def validate_record(self, record: Dict[str, str]) -> Dict[str, str]:
-        validated = {}
+    def validate_row(self, record: Dict[str, Any]) -> Tuple[str, ...]:
+        """Validate a record into a row: its values as a tuple in header order."""
+        return tuple(
+            col.validate_value(record[col.normalized_name] if col.normalized_name in record
+                               else record.get(col.name))
+            for col in self.columns
+        )
+    
+    def validate_rows(self, records: List[Dict[str, Any]]) -> List[Tuple[str, ...]]:
+        """Validate many records column by column with ColumnSchema.validate_values."""
+        if not self.columns:
+            return [() for _ in records]
+        columns = []
         for col in self.columns:
-            value = record.get(col.normalized_name, record.get(col.name, ""))
-            validated[col.normalized_name] = col.validate_value(value)
-        return validated
+            key, name = col.normalized_name, col.name
+            values = [record[key] if key in record else record.get(name) for record in records]
+            columns.append(col.validate_values(values))
+        return list(zip(*columns))
+
+
+class ExtractionPlan:
+    """
+    Column roles for each extraction strategy, resolved once per schema.
+    
+    Each strategy names a column's role by keywords in its name; the rule
+    tables below are those keyword lists. A plan turns them into slot
+    tables of ``(normalized_name, field)`` so strategies copy values they
+    have already extracted into the right columns without re-inspecting
+    column names per record.
+    """
+    
+    # Rules are checked in order; a column takes the first role it matches
+    REFERENCE_RULES = [
+        (('author', 'name'), 'author'),
+        (('date', 'year', 'published'), 'year'),
+        (('title',), 'title'),
+        (('publisher', 'institution', 'organization'), 'publisher'),
+        (('detail', 'text', 'description'), 'text'),
+    ]
+    REFERENCE_LINE_RULES = [
+        (('author', 'name'), 'author'),
+        (('date', 'year', 'published'), 'year'),
+        (('title',), 'title'),
+        (('detail', 'text', 'description'), 'line'),
+    ]
+    LINE_RULES = [
+        (('author', 'name'), 'author'),
+        (('date', 'year', 'published'), 'year'),
+        (('title',), 'title'),
+        (('detail', 'text', 'description', 'content'), 'line'),
+    ]
+    CONTENT_BLOCK_RULES = [
+        (('author', 'name'), 'author'),
+        (('date', 'year', 'published'), 'year'),
+        (('title',), 'title'),
+        (('publisher', 'institution', 'organization'), 'publisher'),
+        (('detail', 'text', 'description', 'content'), 'text'),
+    ]
+    FINANCIAL_FILL_RULES = [
+        (('entity', 'company', 'name', 'description'), 'line'),
+    ]
+    PATTERN_FILL_RULES = [
+        (('title', 'description', 'text', 'detail'), 'line'),
+        (('entity', 'company', 'organization'), 'caps'),
+    ]
+    
+    def __init__(self, schema: ExtractionSchema):
+        self.headers = schema.get_headers()
+        name_keys = [(col.normalized_name, col.name.lower().replace('_', '').replace(' ', ''))
+                     for col in schema.columns]
+        
+        self.reference = self._slots(name_keys, self.REFERENCE_RULES)
+        self.reference_line = self._slots(name_keys, self.REFERENCE_LINE_RULES)
+        self.line = self._slots(name_keys, self.LINE_RULES)
+        self.financial_fill = self._slots(name_keys, self.FINANCIAL_FILL_RULES)
+        self.pattern_fill = self._slots(name_keys, self.PATTERN_FILL_RULES)
+        # Content blocks have always matched on the normalized name
+        self.content_block = self._slots(
+            [(col.normalized_name, col.normalized_name.replace('_', '')) for col in schema.columns],
+            self.CONTENT_BLOCK_RULES)
+        
+        self.wants_publisher = any(field == 'publisher' for _, field in self.reference)
+        # Column patterns compiled once: (normalized_name, [pattern, ...])
+        self.pattern_columns = [
+            (col.normalized_name, [re.compile(p, re.IGNORECASE) for p in col.patterns])
+            for col in schema.columns if col.patterns
+        ]
+        self.number_columns = [
+            (col.normalized_name, [re.compile(p, re.IGNORECASE) for p in col.patterns])
+            for col in schema.columns if col.data_type == 'number' and col.patterns
+        ]
+    
+    @staticmethod
+    def _slots(name_keys: List[Tuple[str, str]], rules) -> List[Tuple[str, str]]:
+        slots = []
+        for name, key in name_keys:
+            for keywords, field_name in rules:
+                if any(k in key for k in keywords):
+                    slots.append((name, field_name))
+                    break
+        return slots
+    
+    def fill(self, slots: List[Tuple[str, str]], values: Dict[str, str]) -> Dict[str, str]:
+        """A blank record with ``values[field]`` copied into each slot."""
+        record = dict.fromkeys(self.headers, "")
+        for name, field_name in slots:
+            record[name] = values[field_name]
+        return record
+
+
+# ============================================================
+# RECORD STORE
+# ============================================================
+
+# Rows inspected by RecordTable.extend before deciding, per column, whether
+# sharing repeated values pays off
+SHARED_VALUE_SAMPLE = 256
+
+
+class RecordTable:
+    """
+    Extraction results as rows: one tuple of values per record, positional
+    under ``headers``. A row costs a tuple instead of a dict repeating
+    every column name; dicts are only built at the JSON edge (``to_dicts``).
+    Iterating a table yields its rows.
+    """
+    
+    __slots__ = ('headers', 'rows')
+    
+    def __init__(self, headers: List[str], rows: Optional[List[Tuple[str, ...]]] = None):
+        self.headers = list(headers)
+        self.rows: List[Tuple[str, ...]] = rows if rows is not None else []
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __iter__(self) -> Iterator[Tuple[str, ...]]:
+        return iter(self.rows)
+    
+    def append(self, row: Tuple[str, ...]):
+        self.rows.append(row)
+    
+    def extend(self, rows: Iterable[Tuple[str, ...]]):
+        """
+        Append rows, keeping one copy of each value repeated down a column
+        (years, publishers, source documents). Columns whose sample turns
+        out mostly distinct stop being tracked.
+        """
+        rows = iter(rows)
+        append = self.rows.append
+        shared: List[Optional[Dict[str, str]]] = [{} for _ in self.headers]
+        for row in itertools.islice(rows, SHARED_VALUE_SAMPLE):
+            append(tuple([values.setdefault(value, value) for value, values in zip(row, shared)]))
+        
+        shared = [values if len(values) <= SHARED_VALUE_SAMPLE // 2 else None for values in shared]
+        if all(values is None for values in shared):
+            self.rows.extend(rows)
+            return
+        for row in rows:
+            append(tuple([value if values is None else values.setdefault(value, value)
+                          for value, values in zip(row, shared)]))
+    
+    def iter_dicts(self) -> Iterator[Dict[str, str]]:
+        headers = self.headers
+        return (dict(zip(headers, row)) for row in self.rows)
+    
+    def to_dicts(self) -> List[Dict[str, str]]:
+        return list(self.iter_dicts())
+
+
+def iter_rows(records: Iterable[Any], headers: List[str]) -> Iterator[Tuple[Any, ...]]:
+    """
+    Rows of ``records`` in ``headers`` order. Records may be rows already
+    (a RecordTable with these headers, or tuples) or dicts, which are
+    looked up by header ("" if missing).
+    """
+    if isinstance(records, RecordTable):
+        if records.headers == list(headers):
+            return iter(records.rows)
+        records = records.iter_dicts()
+    return (tuple(record.get(header, "") for header in headers) if isinstance(record, dict) else record
+            for record in records)
 
 
 # ============================================================
 # EXTRACTION ENGINE
 # ============================================================
 
+DEDUP_MODES = ('exact', 'near')
+
+# Near-duplicate mode compares this many characters of each
+# whitespace-collapsed value, so line[:100] / line[:200] / text[:300]
+# variants of the same content collapse into one record
+NEAR_DUPLICATE_CHARS = 100
+
+
+def resolve_dedup_mode(value: Optional[str]) -> str:
+    """Map a 'dedup' request field to one of DEDUP_MODES (default 'exact')."""
+    return 'near' if (value or '').strip().lower() == 'near' else 'exact'
+
+
+class RecordDeduplicator:
+    """
+    Incremental record deduplication. Each row is reduced to a 16-byte
+    fingerprint of its values in order, so memory per distinct record is
+    fixed no matter how long its values are, and rows can be checked one
+    at a time as a stream. ``near=True`` fingerprints whitespace-collapsed
+    values cut to NEAR_DUPLICATE_CHARS, collapsing whitespace and truncation
+    variants of the same row.
+    """
+    
+    def __init__(self, near: bool = False):
+        self.near = near
+        self.seen: set = set()
+    
+    def fingerprint(self, row: Tuple[str, ...]) -> bytes:
+        values = [str(value) for value in row]
+        if self.near:
+            values = [' '.join(value.split())[:NEAR_DUPLICATE_CHARS] for value in values]
+        digest = hashlib.blake2b(digest_size=16)
+        for value in values:
+            # Each field is hashed after its byte length, so no choice of
+            # values can shift bytes from one field into the next
+            data = value.encode('utf-8', 'surrogatepass')
+            digest.update(len(data).to_bytes(8, 'little'))
+            digest.update(data)
+        return digest.digest()
+    
+    def is_new(self, row: Tuple[str, ...]) -> bool:
+        """True the first time a row (or, in near mode, a near-duplicate) is seen."""
+        key = self.fingerprint(row)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+
 class ExtractionEngine:
     """Main extraction engine with prompt-based classification."""
     
-    def __init__(self, schema: ExtractionSchema, analysis: PromptAnalysis):
+    # Reference tokenizer patterns, compiled once. REFERENCE_START folds the
+    # numbered / "Surname," / "... (Year)" checks into one anchored match.
+    REFERENCE_START = re.compile(r'\s*\[?\d+\]?\s*[A-Z]|[A-Z][a-z]+,|[A-Z].*\(\d{4}\)')
+    REFERENCE_AUTHORS = [
+        re.compile(r'([A-Z][a-z]+(?:,\s*[A-Z]\.(?:\s*[A-Z]\.)*)*)'),
+        re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)'),
+        re.compile(r'([A-Z][^,\.]+)'),
+    ]
+    REFERENCE_TITLE_SPLIT = re.compile(r'[.\-–]')
+    REFERENCE_PUBLISHED_BY = re.compile(r'(?:published by|publisher:?)\s*([^,\.]+)', re.IGNORECASE)
+    # "Name Name Press/University/...": only tried when a keyword follows
+    # whitespace, and only from the start of a letter run; a match can't
+    # begin mid-word, so this finds what an unanchored search would
+    REFERENCE_PUBLISHER_KEYWORD = re.compile(
+        r'\s(?:Press|Publishing|University|Institute|Ltd|Inc)', re.IGNORECASE)
+    REFERENCE_PUBLISHER = re.compile(
+        r'(?<![A-Za-z])([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\s+(?:Press|Publishing|University|Institute|Ltd|Inc))',
+        re.IGNORECASE)
+    # Bibliography entries close the year with a full stop ("2017." or
+    # "(2019)."), in-text citations ("Smith (2019) argues") don't
+    REFERENCE_YEAR = re.compile(r'\b(?:19|20)\d{2}[a-z]?\)?\.')
+    WHITESPACE_RUN = re.compile(r'\s+')
+    CELL_GAP = re.compile(r'\s{2,}')
+    CAPITALIZED_RUN = re.compile(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b')
+    
+    def __init__(self, schema: ExtractionSchema, analysis: PromptAnalysis,
+                 dedup: str = 'exact'):
         self.schema = schema
         self.analysis = analysis
+        self.dedup = dedup
+        # Page span of the text the strategies ran over, once known
+        self.target_pages: Optional[Tuple[int, int]] = None
     
-    def extract(self, text: str, tables: List[List]) -> List[Dict[str, str]]:
+    def extract(self, text: str, tables: List[List]) -> RecordTable:
         """Extract data based on prompt analysis."""
-        results = []
-        seen = set()
-        
+        records = RecordTable(self.schema.get_headers())
+        records.extend(self.iter_extract(text, tables))
+        return records
+    
+    def iter_extract(self, text: str, tables: List[List]) -> Iterator[Tuple[str, ...]]:
+        """Yield validated, deduplicated rows (in schema header order) as they are produced."""
         # Analyze document structure
         doc_analyzer = DocumentStructureAnalyzer(text)
         sections = doc_analyzer.analyze()
@@ -674,40 +1139,95 @@ class ExtractionEngine:
         print(f"Extraction type: {self.analysis.extraction_type.value}")
         print(f"Target section: {self.analysis.section_hint or 'Full document'}")
         
-        # Extract based on type
+        yield from self._finalize([self._run_strategy(target_text, tables)])
+    
+    def iter_extract_pages(self, pages: Iterable['PageContent']) -> Iterator[Tuple[str, ...]]:
+        """
+        Yield rows page by page, so the first rows are available before
+        the rest of the document has been read.
+        
+        Section targeting needs the whole document's structure, so prompts
+        with a section hint collect all pages first and defer to iter_extract.
+        """
+        if self.analysis.section_hint:
+            text_parts, all_tables = [], []
+            for page in pages:
+                text_parts.append(page.marked_text)
+                all_tables.extend(page.tables)
+            yield from self.iter_extract("\n\n".join(text_parts), all_tables)
+            return
+        
+        def page_batches():
+            for page in pages:
+                first = self.target_pages[0] if self.target_pages else page.page_num
+                self.target_pages = (first, page.page_num)
+                yield self._run_strategy(page.marked_text, page.tables)
+        
+        yield from self._finalize(page_batches())
+    
+    def _run_strategy(self, text: str, tables: List[List]) -> List[Dict[str, str]]:
+        """Run the extraction strategy selected by the prompt analysis."""
         if self.analysis.extraction_type == ExtractionType.REFERENCES:
-            results = self._extract_references(target_text)
+            return self._extract_references(text)
         elif self.analysis.extraction_type == ExtractionType.TABLES:
-            results = self._extract_tables(target_text, tables)
+            return self._extract_tables(text, tables)
         elif self.analysis.extraction_type == ExtractionType.FINANCIAL:
-            results = self._extract_financial(target_text)
-        else:
-            # Generic extraction - try all strategies
-            results = self._extract_generic(target_text, tables)
+            return self._extract_financial(text)
+        # Generic extraction - try all strategies
+        return self._extract_generic(text, tables)
+    
+    def _finalize(self, batches: Iterable[List[Dict[str, str]]]) -> Iterator[Tuple[str, ...]]:
+        """
+        Apply constraints, validate and deduplicate raw records into rows.
+        
+        Records arrive in batches (one strategy run each) and every batch is
+        validated column by column with ExtractionSchema.validate_rows.
+        """
+        constraints = self.analysis.constraints
         
-        # Apply constraints
-        results = self._apply_constraints(results)
+        if 'sort' in constraints:
+            # Sorting needs every record before the first can be emitted,
+            # so validate them as one batch
+            records = [record for batch in batches for record in batch]
+            batches = [self._apply_constraints(records)]
+        else:
+            if 'year_range' in constraints:
+                min_year, max_year = constraints['year_range']
+                batches = ([r for r in batch if self._in_year_range(r, min_year, max_year)]
+                           for batch in batches)
+            if 'limit' in constraints:
+                batches = self._limit_batches(batches, constraints['limit'])
         
         # Deduplicate
-        final_results = []
-        for record in results:
-            validated = self.schema.validate_record(record)
-            key = tuple(sorted(validated.items()))
-            if key not in seen and self._has_data(validated):
-                seen.add(key)
-                final_results.append(validated)
-        
-        return final_results
+        deduplicator = RecordDeduplicator(near=self.dedup == 'near')
+        for batch in batches:
+            for row in self.schema.validate_rows(batch):
+                if any(row) and deduplicator.is_new(row):
+                    yield row
+    
+    @staticmethod
+    def _limit_batches(batches: Iterable[List[Dict[str, str]]], limit: int) -> Iterator[List[Dict[str, str]]]:
+        """Truncate a stream of batches to its first ``limit`` records."""
+        remaining = limit
+        for batch in batches:
+            if remaining <= 0:
+                return
+            batch = batch[:remaining]
+            remaining -= len(batch)
+            yield batch
     
     def _get_target_text(self, text: str, doc_analyzer: DocumentStructureAnalyzer) -> str:
         """Get the target text based on section hint."""
+        full_span = (doc_analyzer.page_at(0), doc_analyzer.page_at(max(len(text) - 1, 0)))
         if not self.analysis.section_hint:
+            self.target_pages = full_span
             return text
         
         # Try to find the section
         section = doc_analyzer.find_section(self.analysis.section_hint)
         if section:
-            print(f"Found section: {section.title}")
+            print(f"Found section: {section.title} (pages {section.start_page}-{section.end_page})")
+            self.target_pages = (section.start_page, section.end_page)
             return section.content
         
         # Try by section type
@@ -715,68 +1235,39 @@ class ExtractionEngine:
             sections = doc_analyzer.get_sections_by_type(self.analysis.section_type)
             if sections:
                 print(f"Found {len(sections)} sections of type {self.analysis.section_type.value}")
+                self.target_pages = (min(s.start_page for s in sections),
+                                     max(s.end_page for s in sections))
                 return '\n\n'.join(s.content for s in sections)
         
+        self.target_pages = full_span
         return text
     
     def _extract_references(self, text: str) -> List[Dict[str, str]]:
         """Extract academic references/bibliography with flexible pattern matching."""
         results = []
-        lines = text.split('\n')
-        
-        # More flexible reference patterns
-        patterns = [
-            # APA: Author, A. A. (Year). Title. Publisher.
-            r'^([A-Z][a-z]+(?:,\s*[A-Z]\.(?:\s*[A-Z]\.)*)+)\s*\((\d{4})\)\.\s*(.+)',
-            # Author (Year) format
-            r'^([A-Z][a-z]+,\s*[A-Z]\.(?:\s*[A-Z]\.)*)\s*\((\d{4})\)\s*(.+)',
-            # Author (Year) - with dash
-            r'^([A-Z][a-z]+(?:,\s*[A-Z]\.(?:\s*[A-Z]\.)*)*)\s*[\(\[]?(\d{4})[\)\]]?\s*[\.\-–]\s*(.+)',
-            # Numbered reference: [1] Author, Title, Year
-            r'^\s*\[?\d+\]?\s*([A-Z][^.]+)\.\s*([^.]+)\.\s*([^,]+),?\s*(\d{4})',
-            # MLA: Author. Title. Publisher, Year.
-            r'^([A-Z][a-z]+,\s*[A-Z][a-z]+)\.\s*([^.]+)\.\s*([^,]+),\s*(\d{4})',
-            # Chicago: Author. Title. Publisher, Year.
-            r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)\.\s*([^.]+)\.\s*([^,]+),\s*(\d{4})',
-            # Simple: Author, Title, Publisher, Year
-            r'^([A-Z][^,]+),\s*([^,]+),\s*([^,]+),\s*(\d{4})',
-            # Just author and year
-            r'^([A-Z][a-z]+(?:,\s*[A-Z]\.(?:\s*[A-Z]\.)*)*)\s*[\(\[]?(\d{4})[\)\]]?',
-        ]
-        
-        current_ref = ""
         ref_lines = []
         
-        for line in lines:
+        for line in text.split('\n'):
             line = line.strip()
             if not line:
-                if current_ref or ref_lines:
-                    record = self._parse_reference_flexible(current_ref, ref_lines, patterns)
+                if ref_lines:
+                    record = self._parse_reference_flexible(' '.join(ref_lines))
                     if record:
                         results.append(record)
-                    current_ref = ""
                     ref_lines = []
                 continue
             
-            # Check if this starts a new reference
-            is_new_ref = self._is_new_reference(line, patterns)
-            
-            if is_new_ref:
-                # Process previous reference
-                if current_ref or ref_lines:
-                    record = self._parse_reference_flexible(current_ref, ref_lines, patterns)
-                    if record:
-                        results.append(record)
-                current_ref = line
-                ref_lines = [line]
-            else:
-                # Continue current reference
-                current_ref += " " + line
-                ref_lines.append(line)
+            # A line that starts a new reference closes the previous one
+            if ref_lines and self._is_new_reference(line):
+                record = self._parse_reference_flexible(' '.join(ref_lines))
+                if record:
+                    results.append(record)
+                ref_lines = []
+            ref_lines.append(line)
         
         # Process last reference
-        if current_ref or ref_lines:
-            record = self._parse_reference_flexible(current_ref, ref_lines, patterns)
+        if ref_lines:
+            record = self._parse_reference_flexible(' '.join(ref_lines))
             if record:
                 results.append(record)
         
@@ -786,105 +1277,72 @@ class ExtractionEngine:
         
         return results
     
-    def _is_new_reference(self, line: str, patterns: List[str]) -> bool:
-        """Check if line starts a new reference."""
-        # Check for numbered references
-        if re.match(r'^\s*\[?\d+\]?\s*[A-Z]', line):
-            return True
-        
-        # Check for author patterns at start
-        if re.match(r'^[A-Z][a-z]+,', line):
-            return True
-        
-        # Check for year patterns
-        if re.match(r'^[A-Z].*\(\d{4}\)', line):
-            return True
-        
-        return False
+    def _is_new_reference(self, line: str) -> bool:
+        """Check if line starts a new reference (numbered, "Surname," or with a (Year))."""
+        return self.REFERENCE_START.match(line) is not None
     
-    def _parse_reference_flexible(self, text: str, lines: List[str], patterns: List[str]) -> Optional[Dict[str, str]]:
-        """Parse a reference string with flexible matching."""
-        text = text.strip()
-        if len(text) < 10:
-            return None
-        
-        record = self.schema.create_record()
-        
-        # Extract year
-        year_match = re.search(r'\b((?:19|20)\d{2})\b', text)
-        year = year_match.group(1) if year_match else ""
-        
-        # Extract author (usually at the start, before year or title)
-        author_patterns = [
-            r'^([A-Z][a-z]+(?:,\s*[A-Z]\.(?:\s*[A-Z]\.)*)*)',
-            r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)',
-            r'^([A-Z][^,\.]+)',
-        ]
+    def _tokenize_reference(self, text: str, with_publisher: bool = True) -> Tuple[str, str, str, str]:
+        """
+        Split one reference into ``(author, year, title, publisher)``. The
+        publisher scan is the costly one and is skipped unless asked for.
+        """
+        year_match = YEAR_VALUE.search(text)
+        year = year_match.group(0) if year_match else ""
         
+        # Author: first of the start-anchored patterns giving > 3 characters
         author = ""
-        for pattern in author_patterns:
-            match = re.match(pattern, text)
-            if match:
-                author = match.group(1).strip()
-                # Clean up author name
-                author = re.sub(r'\s+', ' ', author)
-                if len(author) > 3:
-                    break
+        if 'A' <= text[:1] <= 'Z':
+            for pattern in self.REFERENCE_AUTHORS:
+                match = pattern.match(text)
+                if match:
+                    author = self.WHITESPACE_RUN.sub(' ', match.group(1).strip())
+                    if len(author) > 3:
+                        break
         
-        # Extract title (usually the longest sentence-like part after author/year)
-        title = ""
-        # Remove author and year from text to find title
+        # Title: first sentence-like segment once author and year are removed
         remaining = text
         if author:
             remaining = remaining.replace(author, '', 1)
         if year:
             remaining = remaining.replace(f'({year})', '').replace(year, '')
-        
-        # Find title-like segments
-        sentences = re.split(r'[.\-–]', remaining)
-        for sent in sentences:
+        title = ""
+        for sent in self.REFERENCE_TITLE_SPLIT.split(remaining):
             sent = sent.strip()
-            if len(sent) > 20 and not re.match(r'^\d', sent):
+            if len(sent) > 20 and not sent[0].isdecimal():
                 title = sent
                 break
         
-        # Extract publisher/institution
         publisher = ""
-        pub_patterns = [
-            r'(?:published by|publisher:?)\s*([^,\.]+)',
-            r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*(?:\s+(?:Press|Publishing|University|Institute|Ltd|Inc)))',
-        ]
-        for pattern in pub_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+        if with_publisher:
+            match = self.REFERENCE_PUBLISHED_BY.search(text)
+            if not match and self.REFERENCE_PUBLISHER_KEYWORD.search(text):
+                match = self.REFERENCE_PUBLISHER.search(text)
             if match:
                 publisher = match.group(1).strip()
-                break
         
-        # Map to schema columns
-        for col in self.schema.columns:
-            col_lower = col.name.lower().replace('_', '').replace(' ', '')
-            
-            if any(k in col_lower for k in ['author', 'name']):
-                record[col.normalized_name] = author
-            elif any(k in col_lower for k in ['date', 'year', 'published']):
-                record[col.normalized_name] = year
-            elif any(k in col_lower for k in ['title']):
-                record[col.normalized_name] = title
-            elif any(k in col_lower for k in ['publisher', 'institution', 'organization']):
-                record[col.normalized_name] = publisher
-            elif any(k in col_lower for k in ['detail', 'text', 'description']):
-                record[col.normalized_name] = text[:200]
+        return author, year, title, publisher
+    
+    def _parse_reference_flexible(self, text: str) -> Optional[Dict[str, str]]:
+        """Parse a reference string with flexible matching."""
+        text = text.strip()
+        if len(text) < 10:
+            return None
+        
+        plan = self.schema.plan
+        author, year, title, publisher = self._tokenize_reference(text, plan.wants_publisher)
         
         # Only return if we have at least some data
-        if author or title or year:
-            return record
+        if not (author or title or year):
+            return None
         
-        return None
+        return plan.fill(plan.reference, {'author': author, 'year': year, 'title': title,
+                                          'publisher': publisher, 'text': text[:200]})
     
     def _extract_references_by_line(self, text: str) -> List[Dict[str, str]]:
         """Extract references by analyzing each line."""
         results = []
         lines = text.split('\n')
+        plan = self.schema.plan
         
         for line in lines:
             line = line.strip()
@@ -895,8 +1353,6 @@ class ExtractionEngine:
             if re.match(r'^(CHAPTER|Section|References|Bibliography|APPENDIX)', line, re.IGNORECASE):
                 continue
             
-            record = self.schema.create_record()
-            
             # Extract year
             year_match = re.search(r'\b((?:19|20)\d{2})\b', line)
             year = year_match.group(1) if year_match else ""
@@ -913,21 +1369,11 @@ class ExtractionEngine:
                 title = re.sub(rf'\(?{year}\)?', '', title).strip()
             title = re.sub(r'^[\.\-–\s]+', '', title)
             
-            # Map to schema
-            for col in self.schema.columns:
-                col_lower = col.name.lower().replace('_', '').replace(' ', '')
-                
-                if any(k in col_lower for k in ['author', 'name']):
-                    record[col.normalized_name] = author
-                elif any(k in col_lower for k in ['date', 'year', 'published']):
-                    record[col.normalized_name] = year
-                elif any(k in col_lower for k in ['title']):
-                    record[col.normalized_name] = title[:150] if title else ""
-                elif any(k in col_lower for k in ['detail', 'text', 'description']):
-                    record[col.normalized_name] = line[:200]
-            
             if author or year:
-                results.append(record)
+                results.append(plan.fill(plan.reference_line, {
+                    'author': author, 'year': year,
+                    'title': title[:150] if title else "", 'line': line[:200]
+                }))
         
         return results
     
@@ -965,6 +1411,16 @@ class ExtractionEngine:
     
     def _extract_tables(self, text: str, tables: List[List]) -> List[Dict[str, str]]:
         """Extract data from tables."""
+        results = self._records_from_tables(tables)
+        
+        # Also try to extract tables from text
+        text_tables = self._extract_tables_from_text(text)
+        results.extend(text_tables)
+        
+        return results
+    
+    def _records_from_tables(self, tables: List[List]) -> List[Dict[str, str]]:
+        """Map the rows of detected tables onto the schema columns."""
         results = []
         
         # Process detected tables
@@ -999,10 +1455,6 @@ class ExtractionEngine:
                         record[col.normalized_name] = ""
                 results.append(record)
         
-        # Also try to extract tables from text
-        text_tables = self._extract_tables_from_text(text)
-        results.extend(text_tables)
-        
         return results
     
     def _extract_tables_from_text(self, text: str) -> List[Dict[str, str]]:
@@ -1020,15 +1472,8 @@ class ExtractionEngine:
                 continue
             
             # Check for delimiter-separated values
-            if '\t' in line or '  ' in line or '|' in line:
-                if '\t' in line:
-                    cells = line.split('\t')
-                elif '|' in line:
-                    cells = [c.strip() for c in line.split('|') if c.strip()]
-                else:
-                    cells = re.split(r'\s{2,}', line)
-                
-                cells = [c.strip() for c in cells if c.strip()]
+            cells = self._split_cells(line)
+            if cells is not None:
                 if len(cells) >= 2:
                     potential_table.append(cells)
             else:
@@ -1041,6 +1486,18 @@ class ExtractionEngine:
         
         return results
     
+    def _split_cells(self, line: str) -> Optional[List[str]]:
+        """Cells of a tab, pipe or multi-space separated line; None if it has no delimiter."""
+        if '\t' in line:
+            cells = line.split('\t')
+        elif '|' in line:
+            cells = [c.strip() for c in line.split('|') if c.strip()]
+        elif '  ' in line:
+            cells = self.CELL_GAP.split(line)
+        else:
+            return None
+        return [c.strip() for c in cells if c.strip()]
+    
     def _process_table(self, table: List[List[str]]) -> List[Dict[str, str]]:
         """Process a detected table."""
         if len(table) < 2:
@@ -1075,6 +1532,7 @@ class ExtractionEngine:
         """Extract financial data."""
         results = []
         lines = text.split('\n')
+        plan = self.schema.plan
         
         for line in lines:
             line = line.strip()
@@ -1085,24 +1543,20 @@ class ExtractionEngine:
             has_data = False
             
             # Extract amounts
-            for col in self.schema.columns:
-                if col.data_type == 'number':
-                    for pattern in col.patterns:
-                        match = re.search(pattern, line, re.IGNORECASE)
-                        if match:
-                            record[col.normalized_name] = match.group(1)
-                            has_data = True
-                            break
+            for name, patterns in plan.number_columns:
+                for pattern in patterns:
+                    match = pattern.search(line)
+                    if match:
+                        record[name] = match.group(1)
+                        has_data = True
+                        break
             
             # Extract other fields
-            for col in self.schema.columns:
-                if not record.get(col.normalized_name):
-                    col_lower = col.name.lower().replace('_', '').replace(' ', '')
-                    
-                    if any(k in col_lower for k in ['entity', 'company', 'name', 'description']):
-                        # Use remaining text
-                        record[col.normalized_name] = line[:100]
-                        has_data = True
+            for name, _ in plan.financial_fill:
+                if not record.get(name):
+                    # Use remaining text
+                    record[name] = line[:100]
+                    has_data = True
             
             if has_data:
                 results.append(record)
@@ -1110,25 +1564,89 @@ class ExtractionEngine:
         return results
     
     def _extract_generic(self, text: str, tables: List[List]) -> List[Dict[str, str]]:
-        """Generic extraction using multiple strategies."""
-        results = []
-        
-        # Strategy 1: Tables
-        results.extend(self._extract_tables(text, tables))
-        
-        # Strategy 2: References (if columns suggest it)
-        if any('author' in c.name.lower() or 'title' in c.name.lower() for c in self.schema.columns):
-            results.extend(self._extract_references(text))
-        
-        # Strategy 3: Pattern-based
-        results.extend(self._extract_by_patterns(text))
+        """
+        Generic extraction: split the text once into typed blocks and give
+        each block to the strategy for its type, so every line is parsed by
+        one strategy rather than by all of them.
+        """
+        results = self._records_from_tables(tables)
         
-        # Strategy 4: Section content extraction (fallback)
+        for block_type, block in self._split_typed_blocks(text):
+            if block_type == 'table':
+                results.extend(self._process_table(block))
+                continue
+            if block_type == 'reference':
+                record = self._parse_reference_flexible(' '.join(block))
+                if record:
+                    results.append(record)
+                    continue
+            for line in block:
+                record = self._record_from_patterns(line)
+                if record:
+                    results.append(record)
+        
+        # Section content extraction (fallback)
         if not results:
             results = self._extract_section_content(text)
         
         return results
     
+    def _split_typed_blocks(self, text: str) -> List[Tuple[str, List]]:
+        """
+        Split text into ``(type, block)`` pairs, in document order, with one
+        pass over the lines. Runs of 3+ delimiter-separated rows are 'table'
+        blocks (lists of cells, as in _extract_tables_from_text). Other lines
+        are split into entries the way _extract_references splits them; an
+        entry that opens like a bibliography entry is a 'reference' block
+        when the schema asks for authors or titles, otherwise 'text'.
+        """
+        want_references = any('author' in c.name.lower() or 'title' in c.name.lower()
+                              for c in self.schema.columns)
+        blocks = []
+        rows = []       # (line, cells) of the current delimited run
+        entry = []      # lines of the current reference-style entry
+        
+        def close_entry():
+            if not entry:
+                return
+            head = entry[0] if len(entry) == 1 else f"{entry[0]} {entry[1]}"
+            is_reference = (want_references and self.REFERENCE_START.match(entry[0])
+                            and self.REFERENCE_YEAR.search(head))
+            blocks.append(('reference' if is_reference else 'text', entry[:]))
+            entry.clear()
+        
+        def add_line(line):
+            if entry and self.REFERENCE_START.match(line):
+                close_entry()
+            entry.append(line)
+        
+        def close_rows():
+            if len(rows) > 2:
+                close_entry()
+                blocks.append(('table', [cells for _, cells in rows]))
+            else:
+                for line, _ in rows:
+                    add_line(line)
+            rows.clear()
+        
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line:
+                close_rows()
+                close_entry()
+                continue
+            
+            cells = self._split_cells(line)
+            if cells is not None and len(cells) >= 2:
+                rows.append((line, cells))
+            else:
+                close_rows()
+                add_line(line)
+        
+        close_rows()
+        close_entry()
+        return blocks
+    
     def _extract_section_content(self, text: str) -> List[Dict[str, str]]:
         """
         Extract all content from section and organize into table by labels.
@@ -1137,9 +1655,6 @@ class ExtractionEngine:
         results = []
         lines = text.split('\n')
         
-        # Get column names from schema
-        col_names = [col.normalized_name for col in self.schema.columns]
-        
         # Try to identify content blocks
         current_block = []
         block_lines = []
@@ -1148,7 +1663,7 @@ class ExtractionEngine:
             line = line.strip()
             if not line:
                 if current_block:
-                    record = self._process_content_block(current_block, col_names)
+                    record = self._process_content_block(current_block)
                     if record and self._has_data(record):
                         results.append(record)
                     current_block = []
@@ -1158,7 +1673,7 @@ class ExtractionEngine:
         
         # Process last block
         if current_block:
-            record = self._process_content_block(current_block, col_names)
+            record = self._process_content_block(current_block)
             if record and self._has_data(record):
                 results.append(record)
         
@@ -1168,12 +1683,11 @@ class ExtractionEngine:
         
         return results
     
-    def _process_content_block(self, lines: List[str], col_names: List[str]) -> Dict[str, str]:
+    def _process_content_block(self, lines: List[str]) -> Dict[str, str]:
         """Process a block of content lines into a record."""
-        record = {col: "" for col in col_names}
-        
+        plan = self.schema.plan
         if not lines:
-            return record
+            return plan.fill([], {})
         
         # Join lines into single text
         full_text = ' '.join(lines)
@@ -1220,26 +1734,14 @@ class ExtractionEngine:
                 break
         
         # Map to columns
-        for col in col_names:
-            col_lower = col.lower().replace('_', '')
-            
-            if any(k in col_lower for k in ['author', 'name']):
-                record[col] = author
-            elif any(k in col_lower for k in ['date', 'year', 'published']):
-                record[col] = year
-            elif any(k in col_lower for k in ['title']):
-                record[col] = title
-            elif any(k in col_lower for k in ['publisher', 'institution', 'organization']):
-                record[col] = publisher
-            elif any(k in col_lower for k in ['detail', 'text', 'description', 'content']):
-                record[col] = full_text[:300]
-        
-        return record
+        return plan.fill(plan.content_block, {'author': author, 'year': year, 'title': title,
+                                              'publisher': publisher, 'text': full_text[:300]})
     
     def _extract_line_by_line(self, text: str) -> List[Dict[str, str]]:
         """Extract by analyzing each line individually."""
         results = []
         lines = text.split('\n')
+        plan = self.schema.plan
         
         for line in lines:
             line = line.strip()
@@ -1257,8 +1759,6 @@ class ExtractionEngine:
             if any(re.match(p, line) for p in skip_patterns):
                 continue
             
-            record = self.schema.create_record()
-            
             # Extract year
             year_match = re.search(r'\b((?:19|20)\d{2})\b', line)
             year = year_match.group(1) if year_match else ""
@@ -1281,65 +1781,45 @@ class ExtractionEngine:
             if len(remaining) > 10:
                 title = remaining[:150]
             
-            # Map to schema columns
-            for col in self.schema.columns:
-                col_lower = col.name.lower().replace('_', '').replace(' ', '')
-                
-                if any(k in col_lower for k in ['author', 'name']):
-                    record[col.normalized_name] = author
-                elif any(k in col_lower for k in ['date', 'year', 'published']):
-                    record[col.normalized_name] = year
-                elif any(k in col_lower for k in ['title']):
-                    record[col.normalized_name] = title
-                elif any(k in col_lower for k in ['detail', 'text', 'description', 'content']):
-                    record[col.normalized_name] = line[:200]
-            
             # Only add if we extracted something meaningful
             if author or year or (title and len(title) > 20):
-                results.append(record)
+                results.append(plan.fill(plan.line, {
+                    'author': author, 'year': year, 'title': title, 'line': line[:200]
+                }))
         
         return results
     
-    def _extract_by_patterns(self, text: str) -> List[Dict[str, str]]:
-        """Extract using column-specific patterns."""
-        results = []
-        lines = text.split('\n')
+    def _record_from_patterns(self, line: str) -> Optional[Dict[str, str]]:
+        """Build a record from one line using column patterns, if any column matches."""
+        line = line.strip()
+        if not line or len(line) < 10:
+            return None
         
-        for line in lines:
-            line = line.strip()
-            if not line or len(line) < 10:
-                continue
-            
-            record = self.schema.create_record()
-            has_match = False
-            
-            for col in self.schema.columns:
-                if col.patterns:
-                    for pattern in col.patterns:
-                        match = re.search(pattern, line, re.IGNORECASE)
-                        if match:
-                            record[col.normalized_name] = match.group(1) if match.groups() else match.group(0)
-                            has_match = True
-                            break
-            
-            # Fill remaining columns
-            for col in self.schema.columns:
-                if not record.get(col.normalized_name):
-                    col_lower = col.name.lower().replace('_', '').replace(' ', '')
-                    
-                    if any(k in col_lower for k in ['title', 'description', 'text', 'detail']):
-                        record[col.normalized_name] = line[:200]
+        plan = self.schema.plan
+        record = self.schema.create_record()
+        has_match = False
+        
+        for name, patterns in plan.pattern_columns:
+            for pattern in patterns:
+                match = pattern.search(line)
+                if match:
+                    record[name] = match.group(1) if match.groups() else match.group(0)
+                    has_match = True
+                    break
+        
+        # Fill remaining columns
+        for name, field_name in plan.pattern_fill:
+            if not record.get(name):
+                if field_name == 'line':
+                    record[name] = line[:200]
+                    has_match = True
+                else:
+                    caps = self.CAPITALIZED_RUN.search(line)
+                    if caps:
+                        record[name] = caps.group(1)
                         has_match = True
-                    elif any(k in col_lower for k in ['entity', 'company', 'organization']):
-                        caps = re.findall(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\b', line)
-                        if caps:
-                            record[col.normalized_name] = caps[0]
-                            has_match = True
-            
-            if has_match:
-                results.append(record)
         
-        return results
+        return record if has_match else None
     
     def _apply_constraints(self, results: List[Dict[str, str]]) -> List[Dict[str, str]]:
         """Apply constraints from prompt analysis."""
@@ -1351,19 +1831,7 @@ class ExtractionEngine:
         # Year range filter
         if 'year_range' in constraints:
             min_year, max_year = constraints['year_range']
-            filtered = []
-            for record in results:
-                # Find year field
-                for key, value in record.items():
-                    if 'year' in key.lower() or 'date' in key.lower():
-                        try:
-                            year = int(re.search(r'\d{4}', str(value)).group(0))
-                            if min_year <= year <= max_year:
-                                filtered.append(record)
-                        except:
-                            filtered.append(record)
-                        break
-            results = filtered
+            results = [r for r in results if self._in_year_range(r, min_year, max_year)]
         
         # Limit
         if 'limit' in constraints:
@@ -1379,6 +1847,17 @@ class ExtractionEngine:
         
         return results
     
+    def _in_year_range(self, record: Dict[str, str], min_year: int, max_year: int) -> bool:
+        """Check the record's first year/date field against a year range."""
+        for key, value in record.items():
+            if 'year' in key.lower() or 'date' in key.lower():
+                try:
+                    year = int(re.search(r'\d{4}', str(value)).group(0))
+                    return min_year <= year <= max_year
+                except:
+                    return True
+        return False
+    
     def _has_data(self, record: Dict[str, str]) -> bool:
         """Check if record has any non-empty values."""
         return any(v for v in record.values())
@@ -1391,27 +1870,38 @@ class ExtractionEngine:
 class CSVExporter:
     """Exports extraction results to properly formatted CSV."""
     
+    # Rows per chunk yielded by iter_export
+    CHUNK_ROWS = 1000
+    
     @staticmethod
-    def export(records: List[Dict[str, str]], headers: List[str], 
+    def export(records: Iterable[Any], headers: List[str], 
                display_headers: List[str] = None) -> str:
-        if not records:
-            return ""
-        
+        return ''.join(CSVExporter.iter_export(records, headers, display_headers))
+    
+    @staticmethod
+    def iter_export(records: Iterable[Any], headers: List[str],
+                    display_headers: List[str] = None) -> Iterator[str]:
+        """
+        Yield the CSV in chunks of CHUNK_ROWS rows, suitable for a streamed
+        HTTP response. ``records`` is a RecordTable or dicts keyed by header.
+        Yields nothing if there are no records.
+        """
         if display_headers is None:
             display_headers = [h.replace('_', ' ').title() for h in headers]
         
-        output = io.StringIO()
-        header_line = ','.join(CSVExporter._escape_csv_cell(h) for h in display_headers)
-        output.write(header_line + '\n')
-        
-        for record in records:
-            row_values = []
-            for header in headers:
-                value = record.get(header, "")
-                row_values.append(CSVExporter._escape_csv_cell(str(value)))
-            output.write(','.join(row_values) + '\n')
-        
-        return output.getvalue()
+        escape = CSVExporter._escape_csv_cell
+        chunk = None
+        for row in iter_rows(records, headers):
+            if chunk is None:
+                # Header is only written once a record exists so that an
+                # empty result stays an empty string, as export() always did
+                chunk = [','.join(escape(h) for h in display_headers) + '\n']
+            chunk.append(','.join(escape(str(value)) for value in row) + '\n')
+            if len(chunk) >= CSVExporter.CHUNK_ROWS:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
     
     @staticmethod
     def _escape_csv_cell(value: str) -> str:
@@ -1425,39 +1915,619 @@ class CSVExporter:
         return value
 
 
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _to_float(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _to_date(value: str) -> Optional[date]:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.closed = False
+    
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class ArrowExporter:
+    """
+    Exports extraction results as Arrow IPC streams or Parquet files with a
+    typed column per ColumnSchema.data_type. Values that don't convert
+    (e.g. a date column holding only a year) become nulls.
+    """
+    
+    FORMATS = ('arrow', 'parquet')
+    MIMETYPES = {
+        'arrow': 'application/vnd.apache.arrow.stream',
+        'parquet': 'application/vnd.apache.parquet'
+    }
+    EXTENSIONS = {'arrow': 'arrow', 'parquet': 'parquet'}
+    
+    # Rows per record batch (one Parquet row group each)
+    BATCH_ROWS = 10000
+    
+    # data_type -> (arrow type factory, converter for non-empty strings)
+    TYPES = {
+        'year': (lambda: pa.int32(), _to_int),
+        'number': (lambda: pa.float64(), _to_float),
+        'date': (lambda: pa.date32(), _to_date),
+        'email': (lambda: pa.string(), str),
+        'string': (lambda: pa.string(), str),
+    }
+    
+    @staticmethod
+    def arrow_schema(headers: List[str], data_types: List[str]):
+        return pa.schema([
+            (header, ArrowExporter.TYPES.get(data_type, ArrowExporter.TYPES['string'])[0]())
+            for header, data_type in zip(headers, data_types)
+        ])
+    
+    @staticmethod
+    def iter_batches(records: Iterable[Any], headers: List[str],
+                     data_types: List[str]) -> Iterator[Any]:
+        """Convert records to record batches of BATCH_ROWS rows as they arrive."""
+        schema = ArrowExporter.arrow_schema(headers, data_types)
+        converters = [ArrowExporter.TYPES.get(t, ArrowExporter.TYPES['string'])[1] for t in data_types]
+        
+        def column(values, convert):
+            converted = []
+            for value in values:
+                value = str(value).strip() if value is not None else ""
+                converted.append(convert(value) if value else None)
+            return converted
+        
+        rows = iter_rows(records, headers)
+        while True:
+            batch = list(itertools.islice(rows, ArrowExporter.BATCH_ROWS))
+            if not batch:
+                break
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(column(values, convert), type=field.type)
+                 for values, convert, field in zip(zip(*batch), converters, schema)],
+                schema=schema
+            )
+    
+    @staticmethod
+    def iter_export(records: Iterable[Any], headers: List[str],
+                    data_types: List[str], output: str = 'arrow') -> Iterator[bytes]:
+        """
+        Yield the serialized ``output`` ('arrow' or 'parquet') a record batch
+        at a time, suitable for a streamed HTTP response.
+        """
+        schema = ArrowExporter.arrow_schema(headers, data_types)
+        sink = _ChunkSink()
+        if output == 'parquet':
+            writer = pa.parquet.ParquetWriter(sink, schema)
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+        
+        for batch in ArrowExporter.iter_batches(records, headers, data_types):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+        
+        writer.close()
+        yield sink.drain()
+
+
 # ============================================================
 # PDF EXTRACTION
 # ============================================================
 
-def extract_pdf_content(file_path: str) -> Tuple[str, List[List]]:
-    """Extract text and tables from PDF."""
-    text_parts = []
-    all_tables = []
-    
+# A page is a table candidate if it has this many ruling lines...
+TABLE_MIN_RULING_LINES = 3
+# ...or this many text rows made of two or more side-by-side blocks.
+TABLE_MIN_ALIGNED_ROWS = 3
+
+# Page-sharded extraction: default process count, and the smallest shard
+# worth shipping to another process.
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', '1'))
+PDF_MIN_PAGES_PER_WORKER = 8
+
+# Table finder for candidate pages: 'pymupdf' (page.find_tables(), with
+# pdfplumber as a fallback) or 'pdfplumber' alone. find_tables needs
+# PyMuPDF 1.23+; without it every engine is pdfplumber.
+TABLE_ENGINES = ('pymupdf', 'pdfplumber')
+TABLE_ENGINE = os.environ.get('TABLE_ENGINE', 'pymupdf')
+HAS_FIND_TABLES = HAS_PYMUPDF and hasattr(fitz.Page, 'find_tables')
+# pdfplumber is only asked for a second opinion when PyMuPDF built at least
+# a 2x2 grid of cells but no table from it; both finders work from the same
+# ruling lines, so a page with no grid has no table for pdfplumber either
+TABLE_FALLBACK_MIN_CELLS = 4
+
+
+@dataclass
+class PageContent:
+    """Text and tables extracted from a single PDF page."""
+    page_num: int  # 1-based
+    text: str
+    tables: List[List] = field(default_factory=list)
+    table_like: bool = False
+
+    @property
+    def marked_text(self) -> str:
+        """Page text prefixed with the '--- Page N ---' marker."""
+        return f"--- Page {self.page_num} ---\n{self.text}"
+
+
+def _count_ruling_lines(page) -> int:
+    """Count horizontal/vertical strokes and thin rectangles drawn on a page."""
+    count = 0
+    for drawing in page.get_drawings():
+        for item in drawing.get("items", []):
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) < 1 or abs(p1.x - p2.x) < 1:
+                    count += 1
+            elif item[0] == "re":
+                rect = item[1]
+                # Thin rectangles are rules; larger ones are cell borders
+                count += 1 if min(rect.width, rect.height) < 2 else 4
+    return count
+
+
+def _count_aligned_rows(blocks: List[tuple]) -> int:
+    """Count text rows that hold two or more blocks at the same baseline."""
+    rows: Dict[int, int] = {}
+    for block in blocks:
+        if block[6] != 0:  # image block
+            continue
+        key = round(block[1])
+        rows[key] = rows.get(key, 0) + 1
+    return sum(1 for n in rows.values() if n >= 2)
+
+
+def _is_table_like(page, textpage) -> bool:
+    """Cheap PyMuPDF check for pages worth a full pdfplumber table pass."""
+    if _count_ruling_lines(page) >= TABLE_MIN_RULING_LINES:
+        return True
+    blocks = page.get_text("blocks", textpage=textpage)
+    return _count_aligned_rows(blocks) >= TABLE_MIN_ALIGNED_ROWS
+
+
+def resolve_table_engine(value: Optional[str] = None) -> str:
+    """Map a 'table_engine' request field to one of TABLE_ENGINES (default TABLE_ENGINE)."""
+    engine = (value or '').strip().lower()
+    return engine if engine in TABLE_ENGINES else TABLE_ENGINE
+
+
+def _find_tables_pymupdf(page) -> Tuple[List[List], int]:
+    """Tables from PyMuPDF's native finder, and the number of grid cells it saw."""
+    finder = page.find_tables()
+    tables = _clean_tables([table.extract() for table in finder.tables])
+    return tables, len(getattr(finder, 'cells', None) or [])
+
+
+def _clean_tables(tables: List[List]) -> List[List]:
+    """Drop single-row tables and normalise cells to stripped strings."""
+    cleaned = []
+    for table in tables:
+        if table and len(table) > 1:
+            cleaned.append([[str(c).strip() if c else "" for c in row] for row in table])
+    return cleaned
+
+
+def iter_pdf_pages(file_path: str, stats: Optional[Dict[str, Any]] = None,
+                   start: int = 0, stop: Optional[int] = None,
+                   table_engine: str = TABLE_ENGINE):
+    """
+    Walk a PDF once, yielding a PageContent per page.
+
+    PyMuPDF parses each page a single time for both the text and the
+    table-likeness check. Only pages it flagged get a table pass, so
+    text-only pages never pay for one. With ``table_engine='pymupdf'`` that
+    pass is PyMuPDF's own find_tables(); pdfplumber is opened lazily for
+    the pages where it finds nothing (see TABLE_FALLBACK_MIN_CELLS).
+    ``start``/``stop`` select a 0-based page slice; page numbers stay absolute.
+    """
+    if stats is None:
+        stats = {}
+    use_find_tables = HAS_FIND_TABLES and table_engine == 'pymupdf'
+    stats.update(pages=0, table_candidate_pages=0, table_fallback_pages=0, table_pass_seconds=0.0,
+                 table_engine='pymupdf' if use_find_tables else 'pdfplumber')
+
+    if not HAS_PYMUPDF:
+        # No cheap pre-pass available: fall back to pdfplumber for everything
+        if HAS_PDFPLUMBER:
+            with pdfplumber.open(file_path) as pdf:
+                for index, page in enumerate(pdf.pages[start:stop], start=start):
+                    stats['pages'] += 1
+                    yield PageContent(
+                        page_num=index + 1,
+                        text=page.extract_text() or "",
+                        tables=_clean_tables(page.extract_tables()),
+                        table_like=True
+                    )
+                    page.close()
+        return
+
+    doc = fitz.open(file_path)
+    plumber = None
+    try:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        for index in range(start, stop):
+            page = doc[index]
+            stats['pages'] += 1
+            textpage = page.get_textpage()
+            content = PageContent(
+                page_num=index + 1,
+                text=page.get_text("text", textpage=textpage)
+            )
+
+            if (use_find_tables or HAS_PDFPLUMBER) and _is_table_like(page, textpage):
+                content.table_like = True
+                stats['table_candidate_pages'] += 1
+                started = time.perf_counter()
+                use_plumber = HAS_PDFPLUMBER
+                if use_find_tables:
+                    try:
+                        content.tables, cells = _find_tables_pymupdf(page)
+                        use_plumber = (HAS_PDFPLUMBER and not content.tables
+                                       and cells >= TABLE_FALLBACK_MIN_CELLS)
+                    except Exception as e:
+                        print(f"PyMuPDF table error on page {index + 1}: {e}")
+                    if use_plumber:
+                        stats['table_fallback_pages'] += 1
+                if use_plumber:
+                    try:
+                        if plumber is None:
+                            plumber = pdfplumber.open(file_path)
+                        plumber_page = plumber.pages[index]
+                        content.tables = _clean_tables(plumber_page.extract_tables())
+                        plumber_page.close()
+                    except Exception as e:
+                        print(f"pdfplumber error on page {index + 1}: {e}")
+                stats['table_pass_seconds'] += time.perf_counter() - started
+
+            yield content
+    finally:
+        doc.close()
+        if plumber is not None:
+            plumber.close()
+
+
+def get_pdf_page_count(file_path: str) -> int:
+    """Return the number of pages in a PDF."""
     if HAS_PYMUPDF:
-        try:
-            doc = fitz.open(file_path)
-            for page_num, page in enumerate(doc):
-                text = page.get_text("text")
-                text_parts.append(f"--- Page {page_num + 1} ---\n{text}")
-            doc.close()
-            print(f"PyMuPDF extracted {sum(len(t) for t in text_parts)} chars")
-        except Exception as e:
-            print(f"PyMuPDF error: {e}")
-    
+        with fitz.open(file_path) as doc:
+            return doc.page_count
     if HAS_PDFPLUMBER:
-        try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    tables = page.extract_tables()
-                    for table in tables:
-                        if table and len(table) > 1:
-                            cleaned = [[str(c).strip() if c else "" for c in row] for row in table]
-                            all_tables.append(cleaned)
-            print(f"pdfplumber found {len(all_tables)} tables")
-        except Exception as e:
-            print(f"pdfplumber error: {e}")
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+    return 0
+
+
+def _extract_page_shard(file_path: str, start: int, stop: int,
+                        table_engine: str = TABLE_ENGINE) -> Tuple[List[PageContent], Dict[str, Any]]:
+    """Process-pool worker: extract one contiguous slice of pages."""
+    stats: Dict[str, Any] = {}
+    return list(iter_pdf_pages(file_path, stats, start, stop, table_engine)), stats
+
+
+def _split_page_range(start: int, stop: int, workers: int) -> List[Tuple[int, int]]:
+    """Split ``range(start, stop)`` into at most ``workers`` contiguous shards."""
+    page_count = max(stop - start, 0)
+    shards = max(1, min(workers, page_count // PDF_MIN_PAGES_PER_WORKER))
+    size, extra = divmod(page_count, shards)
+    ranges = []
+    for i in range(shards):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def iter_pdf_pages_parallel(file_path: str, workers: int,
+                            stats: Optional[Dict[str, Any]] = None,
+                            start: int = 0, stop: Optional[int] = None,
+                            table_engine: str = TABLE_ENGINE):
+    """
+    Yield the same PageContent sequence as ``iter_pdf_pages``, but with the
+    page range sharded across a ProcessPoolExecutor. Shards are merged back
+    in page order.
+    """
+    if stats is None:
+        stats = {}
+    page_count = get_pdf_page_count(file_path)
+    stop = page_count if stop is None else min(stop, page_count)
+    ranges = _split_page_range(start, stop, workers)
+    if len(ranges) <= 1:
+        yield from iter_pdf_pages(file_path, stats, start, stop, table_engine)
+        return
+
+    stats.update(pages=0, table_candidate_pages=0, table_fallback_pages=0, table_pass_seconds=0.0)
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        futures = [pool.submit(_extract_page_shard, file_path, start, stop, table_engine)
+                   for start, stop in ranges]
+        for future in futures:
+            pages, shard_stats = future.result()
+            for key in ('pages', 'table_candidate_pages', 'table_fallback_pages', 'table_pass_seconds'):
+                stats[key] += shard_stats[key]
+            stats['table_engine'] = shard_stats['table_engine']
+            yield from pages
+
+
+def resolve_pdf_workers(value: Any = None) -> int:
+    """Parse a worker count from a request value, falling back to PDF_WORKERS."""
+    try:
+        workers = int(value) if value not in (None, '') else PDF_WORKERS
+    except (TypeError, ValueError):
+        workers = PDF_WORKERS
+    return max(1, min(workers, os.cpu_count() or 1))
+
+
+def parse_page_range(value: Any) -> Optional[Tuple[int, int]]:
+    """
+    Parse a 1-based inclusive page range ("5", "5-12", (5, 12)) into a
+    0-based ``(start, stop)`` slice. Returns None if unset or malformed.
+    """
+    if not value:
+        return None
+    if isinstance(value, (tuple, list)):
+        first, last = value
+    else:
+        match = re.fullmatch(r'\s*(\d+)\s*(?:[-–]\s*(\d+))?\s*', str(value))
+        if not match:
+            return None
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+    first, last = int(first), int(last)
+    if first < 1 or last < first:
+        return None
+    return first - 1, last
+
+
+def open_pdf_pages(file_path: str, stats: Optional[Dict[str, Any]] = None, workers: int = 1,
+                   page_range: Optional[Tuple[int, int]] = None,
+                   table_engine: str = TABLE_ENGINE):
+    """Pick the serial or sharded page iterator for a (possibly partial) document."""
+    start, stop = page_range or (0, None)
+    if workers > 1:
+        return iter_pdf_pages_parallel(file_path, workers, stats, start, stop, table_engine)
+    return iter_pdf_pages(file_path, stats, start, stop, table_engine)
+
+
+class LazyPDFDocument:
+    """
+    A PDF whose pages are only parsed as far as needed to find a section.
+    
+    The outline (``get_toc()``) is tried first and costs no page parsing at
+    all; failing that, page text alone (no table detection) is scanned for
+    headings. Callers then extract text and tables for just the located
+    page span.
+    """
+    
+    def __init__(self, file_path: str, known: Optional[Dict[str, Any]] = None):
+        self.file_path = file_path
+        self._doc = None
+        # Sections found for this file before (see known_sections) need no parsing
+        known = known or {}
+        self._outline: Optional[List[DocumentSection]] = self._load_sections(known.get('toc'))
+        self._headings: Optional[List[DocumentSection]] = self._load_sections(known.get('headings'))
+    
+    @property
+    def doc(self):
+        """The PyMuPDF document, opened on first use."""
+        if self._doc is None:
+            self._doc = fitz.open(self.file_path)
+        return self._doc
+    
+    @property
+    def page_count(self) -> int:
+        return self.doc.page_count
+    
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    @property
+    def outline(self) -> List[DocumentSection]:
+        """Sections from the PDF outline, with page spans."""
+        if self._outline is None:
+            toc = [entry for entry in self.doc.get_toc(simple=True) if entry[2] >= 1]
+            self._outline = []
+            for i, (level, title, page) in enumerate(toc):
+                # A section runs to the page where the next same-or-higher
+                # level entry starts (inclusive, it may start mid-page)
+                end_page = self.page_count
+                for next_level, _, next_page in toc[i + 1:]:
+                    if next_level <= level:
+                        end_page = max(page, next_page)
+                        break
+                self._outline.append(DocumentSection(
+                    title=title.strip(),
+                    section_type=DocumentStructureAnalyzer._classify_by_title(title),
+                    level=level,
+                    start_page=page,
+                    end_page=end_page,
+                    start_char=0,
+                    end_char=0
+                ))
+        return self._outline
+    
+    @property
+    def headings(self) -> List[DocumentSection]:
+        """Sections detected from page text headings (text only, no tables)."""
+        if self._headings is None:
+            text = "\n\n".join(f"--- Page {i + 1} ---\n{page.get_text('text')}"
+                                 for i, page in enumerate(self.doc))
+            self._headings = DocumentStructureAnalyzer(text).analyze()
+        return self._headings
+    
+    def known_sections(self) -> Dict[str, Any]:
+        """The outline and headings found so far, as JSON for the extraction cache."""
+        return {'toc': self._dump_sections(self._outline),
+                'headings': self._dump_sections(self._headings)}
     
+    @staticmethod
+    def _dump_sections(sections: Optional[List[DocumentSection]]) -> Optional[List[List]]:
+        if sections is None:
+            return None
+        return [[s.title, s.section_type.value, s.level, s.start_page, s.end_page] for s in sections]
+    
+    @staticmethod
+    def _load_sections(rows: Optional[List[List]]) -> Optional[List[DocumentSection]]:
+        if rows is None:
+            return None
+        return [DocumentSection(title=title, section_type=SectionType(section_type), level=level,
+                                start_page=start_page, end_page=end_page, start_char=0, end_char=0)
+                for title, section_type, level, start_page, end_page in rows]
+    
+    def locate(self, section_hint: Optional[str],
+               section_type: Optional[SectionType]) -> Optional[Tuple[Tuple[int, int], str]]:
+        """
+        Find the page span for a section, the same way ExtractionEngine picks
+        its target text. Returns ``((start, stop), source)`` as a 0-based page
+        slice, or None if nothing matched.
+        """
+        for source in ('toc', 'headings'):
+            sections = self.outline if source == 'toc' else self.headings
+            if not sections:
+                continue
+            if section_hint:
+                section = find_section_in(sections, section_hint)
+                if section:
+                    return (section.start_page - 1, section.end_page), source
+            if section_type:
+                matches = [s for s in sections if s.section_type == section_type]
+                if matches:
+                    start = min(s.start_page for s in matches)
+                    end = max(s.end_page for s in matches)
+                    return (start - 1, end), source
+        return None
+
+
+def locate_section_pages(file_path: str, analysis: 'PromptAnalysis',
+                         stats: Optional[Dict[str, Any]] = None,
+                         digest: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """
+    Use a LazyPDFDocument to find the page slice holding the prompt's target
+    section. Returns None when the prompt has no section hint or the section
+    can't be found, in which case the whole document should be extracted.
+    Like ExtractionEngine._get_target_text, a section type alone (which the
+    prompt analysis infers from any matching word) never narrows the read.
+    
+    Given the file's ``digest``, the outline and headings found are kept in
+    the extraction cache, so later prompts on the same file locate their
+    section without parsing it again.
+    """
+    if not HAS_PYMUPDF or not analysis.section_hint:
+        return None
+    started = time.perf_counter()
+    sections_key = pdf_cache.key(digest, 'sections') if pdf_cache is not None and digest else None
+    known = pdf_cache.get(sections_key) if sections_key else None
+    try:
+        with LazyPDFDocument(file_path, known) as lazy:
+            located = lazy.locate(analysis.section_hint, analysis.section_type)
+            found = lazy.known_sections()
+    except Exception as e:
+        print(f"Lazy section lookup failed: {e}")
+        return None
+    if sections_key and found != known:
+        pdf_cache.put(sections_key, found)
+    if located is None:
+        return None
+    page_range, source = located
+    if stats is not None:
+        stats['lazy_section'] = {
+            "source": source,
+            "pages": [page_range[0] + 1, page_range[1]],
+            "cached": found == known,
+            "locate_seconds": round(time.perf_counter() - started, 4)
+        }
+    print(f"Located target section via {source}: pages {page_range[0] + 1}-{page_range[1]}")
+    return page_range
+
+
+def _summarize_page_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Estimate the table-pass time saved by skipping non-candidate pages."""
+    pages = stats.get('pages', 0)
+    candidates = stats.get('table_candidate_pages', 0)
+    table_seconds = stats.get('table_pass_seconds', 0.0)
+    per_candidate = table_seconds / candidates if candidates else 0.0
+    saved = per_candidate * (pages - candidates)
+
+    stats['table_pass_seconds'] = round(table_seconds, 4)
+    stats['skipped_table_pages'] = pages - candidates
+    stats['estimated_seconds_saved'] = round(saved, 4)
+    stats['estimated_seconds_saved_per_page'] = round(saved / pages, 6) if pages else 0.0
+    return stats
+
+
+def extract_pdf_content(file_path: str, stats: Optional[Dict[str, Any]] = None,
+                        workers: int = 1,
+                        page_range: Optional[Tuple[int, int]] = None,
+                        table_engine: str = TABLE_ENGINE) -> Tuple[str, List[List]]:
+    """
+    Extract text and tables from PDF in a single pass.
+
+    If ``stats`` is given it is filled with page counts and timings for
+    the table pass (see ``_summarize_page_stats``), and ``stats['error']``
+    is set if reading stopped early on an error. With ``workers`` > 1
+    the pages are sharded across processes; the output is unchanged.
+    ``page_range`` is a 0-based ``(start, stop)`` slice (see parse_page_range);
+    pages outside it are never parsed. ``table_engine`` is one of
+    TABLE_ENGINES.
+    """
+    if stats is None:
+        stats = {}
+    text_parts = []
+    all_tables = []
+
+    try:
+        for page in open_pdf_pages(file_path, stats, workers, page_range, table_engine):
+            text_parts.append(page.marked_text)
+            all_tables.extend(page.tables)
+    except Exception as e:
+        # Keep the pages read so far, but flag them as incomplete
+        print(f"PDF extraction error: {e}")
+        stats['error'] = str(e)
+
+    _summarize_page_stats(stats)
+    stats['workers'] = workers
+    print(f"Extracted {sum(len(t) for t in text_parts)} chars from {stats['pages']} pages")
+    print(f"{stats.get('table_engine', table_engine)} checked {stats['table_candidate_pages']} "
+          f"candidate pages ({stats.get('table_fallback_pages', 0)} via pdfplumber fallback), "
+          f"found {len(all_tables)} tables")
+
     return "\n\n".join(text_parts), all_tables
 
 
@@ -1484,6 +2554,364 @@ def extract_csv_content(file_path: str) -> Tuple[str, List[List]]:
         return "", []
 
 
+# ============================================================
+# EXTRACTION CACHE
+# ============================================================
+
+# Bump whenever extract_pdf_content's output changes for the same file
+EXTRACTOR_VERSION = "2"
+
+EXTRACTION_CACHE_ENABLED = os.environ.get('EXTRACTION_CACHE_ENABLED', 'true').lower() == 'true'
+EXTRACTION_CACHE_DIR = os.environ.get('EXTRACTION_CACHE_DIR', os.path.join(os.getcwd(), 'extraction_cache'))
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+
+def file_sha256(file_path: str) -> str:
+    """Hash a file's contents in 1 MB chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Content-addressed JSON cache on local disk.
+    
+    Entries are files named by key; reads refresh the file's mtime so that
+    eviction (oldest mtime first, until under ``max_bytes``) is LRU.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, version: str):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def key(self, digest: str, variant: str = "") -> str:
+        """Cache key for a file's file_sha256 digest; ``variant`` separates extractor settings."""
+        key = f"{digest}-v{self.version}"
+        return f"{key}-{variant}" if variant else key
+    
+    def page_range_key(self, digest: str, page_range: Tuple[int, int], table_engine: str) -> str:
+        """Cache key for the extraction of one page slice of a file."""
+        return self.key(digest, f"{table_engine}-pages-{page_range[0]}-{page_range[1]}")
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+    
+    def get(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+    
+    def put(self, key: str, value: Any):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Cache write error: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.json'):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+    
+    def writer(self, key: str) -> 'CacheEntryWriter':
+        """Start an extraction entry for ``key`` that is filled page by page."""
+        return CacheEntryWriter(self, key)
+
+
+class CacheEntryWriter:
+    """
+    Writes a ``{"text": ..., "tables": [...]}`` extraction entry to disk one
+    page at a time, so caching a streamed document keeps no page in memory.
+    
+    Page text is appended to the entry's temp file as it arrives (JSON-escaped
+    pieces of one string, joined like extract_pdf_content joins them) and
+    tables go to a second temp file that is copied in on commit(). The entry
+    only appears, atomically, when commit() succeeds; discard() drops it.
+    """
+    
+    def __init__(self, cache: ExtractionCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.pages = 0
+        self.committed = False
+        self._tables_written = 0
+        tmp_base = f"{cache._path(key)}.{uuid.uuid4().hex}"
+        self._text_path = f"{tmp_base}.tmp"
+        self._tables_path = f"{tmp_base}.tables.tmp"
+        self._text = open(self._text_path, 'w', encoding='utf-8')
+        self._tables = open(self._tables_path, 'w+', encoding='utf-8')
+        self._text.write('{"text": "')
+    
+    def add_page(self, page: 'PageContent'):
+        if self.pages:
+            self._text.write('\\n\\n')
+        self._text.write(json.dumps(page.marked_text)[1:-1])
+        for table in page.tables:
+            if self._tables_written:
+                self._tables.write(', ')
+            json.dump(table, self._tables)
+            self._tables_written += 1
+        self.pages += 1
+    
+    def commit(self):
+        """Publish the entry, unless nothing was written or it is already closed."""
+        if self._text.closed:
+            return
+        if not self.pages:
+            self.discard()
+            return
+        try:
+            self._text.write('", "tables": [')
+            self._tables.seek(0)
+            shutil.copyfileobj(self._tables, self._text)
+            self._text.write(']}')
+            self._text.close()
+            os.replace(self._text_path, self.cache._path(self.key))
+            self.committed = True
+        except OSError as e:
+            print(f"Cache write error: {e}")
+        finally:
+            self.discard()
+        self.cache._evict()
+    
+    def discard(self):
+        """Close and remove the temp files (a committed entry is kept)."""
+        for f in (self._text, self._tables):
+            f.close()
+        for path in (self._text_path, self._tables_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+pdf_cache = ExtractionCache(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES,
+                            EXTRACTOR_VERSION) if EXTRACTION_CACHE_ENABLED else None
+
+
+def _tee_pages(pages: Iterable[PageContent], writer: CacheEntryWriter) -> Iterator[PageContent]:
+    """Pass pages through, writing each to ``writer``; commit once all have passed."""
+    for page in pages:
+        writer.add_page(page)
+        yield page
+    writer.commit()
+
+
+def extract_pdf_content_cached(file_path: str, stats: Optional[Dict[str, Any]] = None,
+                               workers: int = 1,
+                               page_range: Optional[Tuple[int, int]] = None,
+                               analysis: Optional['PromptAnalysis'] = None,
+                               table_engine: str = TABLE_ENGINE) -> Tuple[str, List[List]]:
+    """
+    extract_pdf_content behind the content-addressed cache.
+    
+    ``stats['cache']`` records whether this call was a hit along with the
+    cache's running hit/miss counters. Whole documents and page ranges are
+    cached separately. On a whole-document miss, an ``analysis`` that
+    targets a section narrows extraction to that section's pages (see
+    locate_section_pages), which are then cached as a page range. Each
+    table engine has its own cache entries.
+    """
+    if stats is None:
+        stats = {}
+    if pdf_cache is None:
+        if not page_range and analysis is not None and analysis.section_hint:
+            page_range = locate_section_pages(file_path, analysis, stats)
+        return extract_pdf_content(file_path, stats, workers, page_range, table_engine)
+    
+    digest = file_sha256(file_path)
+    if not page_range:
+        key = pdf_cache.key(digest, table_engine)
+        cached = pdf_cache.get(key)
+        if cached is not None:
+            stats['cache'] = {"hit": True, **pdf_cache.stats()}
+            print(f"Cache hit for {key[:12]}")
+            return cached['text'], cached['tables']
+        if analysis is not None and analysis.section_hint:
+            page_range = locate_section_pages(file_path, analysis, stats, digest)
+    if page_range:
+        key = pdf_cache.page_range_key(digest, page_range, table_engine)
+        cached = pdf_cache.get(key)
+        if cached is not None:
+            stats['cache'] = {"hit": True, **pdf_cache.stats()}
+            print(f"Cache hit for {key[:12]} pages {page_range[0] + 1}-{page_range[1]}")
+            return cached['text'], cached['tables']
+    
+    text, tables = extract_pdf_content(file_path, stats, workers, page_range, table_engine)
+    # A read that failed partway holds only some pages; never cache it
+    if (text or tables) and 'error' not in stats:
+        pdf_cache.put(key, {"text": text, "tables": tables})
+    stats['cache'] = {"hit": False, **pdf_cache.stats()}
+    return text, tables
+
+
+# ============================================================
+# JOB QUEUE
+# ============================================================
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', '16'))
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', os.path.join(os.getcwd(), 'jobs.sqlite3'))
+JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', str(24 * 3600)))
+
+
+class JobQueue:
+    """
+    Background document jobs on a bounded thread pool, tracked in SQLite.
+    
+    At most ``workers`` jobs run at once and ``max_pending`` more may wait;
+    beyond that ``submit`` refuses the job so the route can answer 429.
+    Finished jobs are kept for ``ttl_seconds`` so clients can poll them.
+    """
+    
+    def __init__(self, db_path: str, workers: int, max_pending: int, ttl_seconds: int):
+        self.db_path = db_path
+        self.capacity = workers + max_pending
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT, status TEXT,"
+                " created_at REAL, started_at REAL, finished_at REAL,"
+                " http_status INTEGER, result TEXT, error TEXT)"
+            )
+            # Jobs that were in flight when the previous process died
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Interrupted by restart', "
+                "finished_at = ? WHERE status IN ('queued', 'running')", (time.time(),)
+            )
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+    
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+    
+    def submit(self, kind: str, func, *args, cleanup: Optional[str] = None) -> Optional[str]:
+        """
+        Queue ``func(*args) -> (body, status)``. Returns the job id, or None
+        when the queue is full. ``cleanup`` names a file to delete afterwards.
+        """
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                return None
+            self._in_flight += 1
+        
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        try:
+            with self._connect() as db:
+                db.execute("DELETE FROM jobs WHERE finished_at < ?", (now - self.ttl_seconds,))
+                db.execute("INSERT INTO jobs (id, kind, status, created_at) VALUES (?, ?, 'queued', ?)",
+                           (job_id, kind, now))
+            self._executor.submit(self._run, job_id, func, args, cleanup)
+        except Exception:
+            # The job will never run: give its slot (and its file) back
+            with self._lock:
+                self._in_flight -= 1
+            if cleanup and os.path.exists(cleanup):
+                os.remove(cleanup)
+            raise
+        return job_id
+    
+    def _run(self, job_id: str, func, args: tuple, cleanup: Optional[str]):
+        self._update(job_id, status='running', started_at=time.time())
+        try:
+            body, http_status = func(*args)
+            status = 'done' if http_status < 400 else 'failed'
+            self._update(job_id, status=status, http_status=http_status,
+                         result=json.dumps(body), error=body.get('error'),
+                         finished_at=time.time())
+        except Exception as e:
+            body = {"success": False, "error": str(e), "traceback": traceback.format_exc()}
+            print(f"Job {job_id} failed: {e}")
+            self._update(job_id, status='failed', http_status=500, result=json.dumps(body),
+                         error=str(e), finished_at=time.time())
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            if cleanup and os.path.exists(cleanup):
+                try:
+                    os.remove(cleanup)
+                except OSError:
+                    pass
+            gc.collect()
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": self._in_flight, "capacity": self.capacity}
+
+
+job_queue = JobQueue(JOB_DB_PATH, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_TTL_SECONDS)
+
+
+def _job_status_body(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job row (without its result payload)."""
+    return {
+        "job_id": job['id'],
+        "kind": job['kind'],
+        "status": job['status'],
+        "created_at": job['created_at'],
+        "started_at": job['started_at'],
+        "finished_at": job['finished_at'],
+        "error": job['error'],
+        "status_url": f"/jobs/{job['id']}",
+        "result_url": f"/jobs/{job['id']}/result"
+    }
+
+
 # ============================================================
 # API ROUTES
 # ============================================================
@@ -1495,15 +2923,266 @@ def health_check():
         'timestamp': datetime.now().isoformat(),
         'backends': {
             'pymupdf': HAS_PYMUPDF,
+            'pymupdf_find_tables': HAS_FIND_TABLES,
             'pdfplumber': HAS_PDFPLUMBER
         },
+        'table_engine': TABLE_ENGINE,
+        'prompt_cache': prompt_cache.stats(),
         'mode': 'enhanced_prompt_classification'
     })
 
 
+@dataclass
+class PreparedPrompt:
+    """A prompt analysed once, with its schema, ready to run on documents."""
+    prompt: str
+    analysis: PromptAnalysis
+    column_names: List[str]
+    schema: ExtractionSchema
+    page_range: Optional[Tuple[int, int]] = None
+    dedup: str = 'exact'
+    table_engine: str = TABLE_ENGINE
+
+
+def prepare_prompt(form: Dict[str, Any]) -> PreparedPrompt:
+    """Analyse the prompt and build the schema from /process form fields."""
+    prompt = form.get('prompt') or 'Extract all relevant data'
+    columns_param = form.get('columns', '')
+    
+    # Analyze prompt (cached for prompts seen before)
+    plan = prompt_cache.get(prompt, columns_param.split(',') if columns_param else None,
+                            form.get('section') or '')
+    analysis = plan.analysis
+    page_range = parse_page_range(form.get('pages') or analysis.constraints.get('page_range'))
+    
+    print(f"Analysis:")
+    print(f"  - Columns: {analysis.columns}")
+    print(f"  - Section hint: {analysis.section_hint}")
+    print(f"  - Extraction type: {analysis.extraction_type.value}")
+    print(f"  - Section type: {analysis.section_type}")
+    
+    return PreparedPrompt(
+        prompt=prompt,
+        analysis=analysis,
+        column_names=plan.column_names,
+        schema=plan.schema,
+        page_range=page_range,
+        dedup=resolve_dedup_mode(form.get('dedup')),
+        table_engine=resolve_table_engine(form.get('table_engine'))
+    )
+
+
+def parse_flag(value: Any, default: bool = True) -> bool:
+    """Read a boolean form/JSON field ('false', '0', 'no', 'off' are false)."""
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ('false', '0', 'no', 'off')
+
+
+OUTPUT_FORMATS = ('json', 'csv') + ArrowExporter.FORMATS
+
+
+def check_output_format(output: str) -> Optional[str]:
+    """Return an error message if ``output`` can't be produced, else None."""
+    if output not in OUTPUT_FORMATS:
+        return f"Unsupported output format: {output} (expected one of {', '.join(OUTPUT_FORMATS)})"
+    if output in ArrowExporter.FORMATS and not HAS_PYARROW:
+        return f"Output format '{output}' requires pyarrow, which is not installed"
+    return None
+
+
+def export_response(records: Iterable[Any], headers: List[str],
+                    display_headers: List[str] = None, output: str = 'csv',
+                    name: str = 'extractions') -> Response:
+    """
+    Stream records as a CSV, Arrow IPC or Parquet attachment without
+    building the file in memory. Columnar types follow the schema's type
+    inference for each header.
+    """
+    if output == 'csv':
+        body = CSVExporter.iter_export(records, headers, display_headers)
+        mimetype, extension = 'text/csv', 'csv'
+    else:
+        data_types = [column.data_type for column in ExtractionSchema(headers).columns]
+        body = ArrowExporter.iter_export(records, headers, data_types, output)
+        mimetype, extension = ArrowExporter.MIMETYPES[output], ArrowExporter.EXTENSIONS[output]
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{name}.{extension}"'}
+    )
+
+
+def extract_document(file_path: str, filename: str, prepared: PreparedPrompt,
+                     workers: int = 1) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Extract records from one saved document with a prepared prompt.
+    
+    Returns ``(result, error)``: ``result`` holds the records (a RecordTable)
+    plus extraction details, ``error`` is a message when the document can't
+    be used.
+    """
+    # Extract content
+    ext = os.path.splitext(filename)[1].lower()
+    
+    pdf_stats = None
+    if ext == '.csv':
+        text, tables = extract_csv_content(file_path)
+    elif ext == '.pdf':
+        pdf_stats = {}
+        text, tables = extract_pdf_content_cached(file_path, pdf_stats, workers,
+                                                  prepared.page_range, prepared.analysis,
+                                                  prepared.table_engine)
+    else:
+        return None, f"Unsupported file type: {ext}"
+    
+    if not text and not tables:
+        return None, "Could not extract content"
+    
+    print(f"Extracted {len(text)} chars, {len(tables)} tables")
+    
+    # Create extraction engine
+    engine = ExtractionEngine(prepared.schema, prepared.analysis, prepared.dedup)
+    
+    # Extract
+    records = engine.extract(text, tables)
+    
+    return {
+        "records": records,
+        "text_length": len(text),
+        "tables_found": len(tables),
+        "target_pages": engine.target_pages,
+        "pdf_extraction": pdf_stats
+    }, None
+
+
+def process_file(file_path: str, filename: str, form: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """
+    Run the /process pipeline on an uploaded file already saved to disk.
+    
+    ``form`` holds the /process form fields. Returns ``(body, status)`` so
+    the synchronous route and background jobs share one implementation.
+    The inline ``csv`` field is left out when ``include_csv`` is false.
+    """
+    print(f"\n{'='*60}")
+    print(f"Processing: {filename}")
+    print(f"Prompt: {form.get('prompt')}")
+    print(f"{'='*60}")
+    
+    prepared = prepare_prompt(form)
+    result, error = extract_document(file_path, filename, prepared,
+                                     resolve_pdf_workers(form.get('workers')))
+    if error:
+        return {"error": error}, 400
+    
+    records = result["records"]
+    page_range = prepared.page_range
+    
+    # Get headers
+    headers = prepared.schema.get_headers()
+    display_headers = prepared.schema.get_display_headers()
+    
+    # Build response
+    response = {
+        "success": True,
+        "extractions": records.to_dicts(),
+        "headers": headers,
+        "display_headers": display_headers,
+        "metadata": {
+            "filename": filename,
+            "prompt": prepared.prompt,
+            "columns": prepared.column_names,
+            "extraction_type": prepared.analysis.extraction_type.value,
+            "section_hint": prepared.analysis.section_hint,
+            "text_length": result["text_length"],
+            "tables_found": result["tables_found"],
+            "extraction_count": len(records),
+            "page_range": [page_range[0] + 1, page_range[1]] if page_range else None,
+            "target_pages": result["target_pages"],
+            "pdf_extraction": result["pdf_extraction"],
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+    if parse_flag(form.get('include_csv')):
+        response["csv"] = CSVExporter.export(records, headers, display_headers)
+    
+    print(f"Extracted {len(records)} records")
+    return response, 200
+
+
+def _extract_batch_document(file_path: str, filename: str,
+                            prepared: PreparedPrompt) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Batch worker: extract_document that reports failures instead of raising."""
+    try:
+        return extract_document(file_path, filename, prepared)
+    except Exception as e:
+        print(f"Batch error on {filename}: {e}")
+        return None, str(e)
+
+
+# Bounds on what .zip archives in one /process/batch request may unpack to
+BATCH_MAX_ARCHIVE_MEMBERS = int(os.environ.get('BATCH_MAX_ARCHIVE_MEMBERS', '1000'))
+BATCH_MAX_UNPACKED_BYTES = int(os.environ.get('BATCH_MAX_UNPACKED_BYTES', str(1024 * 1024 * 1024)))
+
+
+def _save_batch_uploads(files, directory: str) -> Tuple[List[Tuple[Optional[str], str, Optional[str]]],
+                                                        Optional[str]]:
+    """
+    Save uploaded files into ``directory``, unpacking any .zip archives.
+    Returns ``(path, display name, error)`` entries in upload order (an
+    archive that can't be read is one entry with no path and its error),
+    and a request-level error if the archives hold more than
+    BATCH_MAX_ARCHIVE_MEMBERS files or BATCH_MAX_UNPACKED_BYTES in total.
+    Archives are checked before any of
+    their members are written; zipfile never reads past a member's
+    declared size, so the declared sizes bound what is unpacked.
+    """
+    saved = []
+    members_seen = 0
+    unpacked_bytes = 0
+    for index, file in enumerate(files):
+        filename = secure_filename(file.filename or '')
+        if not filename:
+            continue
+        if filename.lower().endswith('.zip'):
+            try:
+                with zipfile.ZipFile(file.stream) as archive:
+                    members = [member for member in archive.infolist() if not member.is_dir()]
+                    members_seen += len(members)
+                    unpacked_bytes += sum(member.file_size for member in members)
+                    if members_seen > BATCH_MAX_ARCHIVE_MEMBERS:
+                        return saved, f"Archives hold more than {BATCH_MAX_ARCHIVE_MEMBERS} files"
+                    if unpacked_bytes > BATCH_MAX_UNPACKED_BYTES:
+                        return saved, f"Archives unpack to more than {BATCH_MAX_UNPACKED_BYTES} bytes"
+                    for member in members:
+                        member_name = secure_filename(os.path.basename(member.filename))
+                        if not member_name:
+                            continue
+                        path = os.path.join(directory, f"{len(saved)}_{member_name}")
+                        with archive.open(member) as src, open(path, 'wb') as dst:
+                            shutil.copyfileobj(src, dst)
+                        saved.append((path, member_name, None))
+            except (zipfile.BadZipFile, OSError) as e:
+                # Reported like any other failing document; the batch goes on
+                saved.append((None, filename, f"Could not read archive: {e}"))
+        else:
+            path = os.path.join(directory, f"{len(saved)}_{filename}")
+            file.save(path)
+            saved.append((path, filename, None))
+    return saved, None
+
+
 @app.route('/process', methods=['POST'])
 def process_document():
-    """Process a document with prompt-based classification."""
+    """
+    Process a document with prompt-based classification.
+    
+    ``output`` = csv, arrow or parquet streams the records as a file
+    instead of JSON; ``include_csv=false`` drops the inline ``csv`` field.
+    ``table_engine`` = pymupdf or pdfplumber picks the PDF table finder.
+    """
     file_path = None
     try:
         if 'file' not in request.files:
@@ -1513,82 +3192,253 @@ def process_document():
         if file.filename == '':
             return jsonify({"error": "No selected file"}), 400
         
-        prompt = request.form.get('prompt', 'Extract all relevant data')
-        columns_param = request.form.get('columns', '')
+        form = request.form.to_dict()
+        output = form.get('output') or 'json'
+        format_error = check_output_format(output)
+        if format_error:
+            return jsonify({"error": format_error}), 400
         
         filename = secure_filename(file.filename)
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
+        file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{filename}")
         file.save(file_path)
         
-        print(f"\n{'='*60}")
-        print(f"Processing: {filename}")
-        print(f"Prompt: {prompt}")
-        print(f"{'='*60}")
-        
-        # Analyze prompt
-        analyzer = PromptAnalyzer()
-        analysis = analyzer.analyze(prompt)
-        
-        print(f"Analysis:")
-        print(f"  - Columns: {analysis.columns}")
-        print(f"  - Section hint: {analysis.section_hint}")
-        print(f"  - Extraction type: {analysis.extraction_type.value}")
-        print(f"  - Section type: {analysis.section_type}")
-        
-        # Extract content
-        ext = os.path.splitext(filename)[1].lower()
-        
-        if ext == '.csv':
-            text, tables = extract_csv_content(file_path)
-        elif ext == '.pdf':
-            text, tables = extract_pdf_content(file_path)
-        else:
-            return jsonify({"error": f"Unsupported file type: {ext}"}), 400
-        
-        if not text and not tables:
-            return jsonify({"error": "Could not extract content"}), 400
-        
-        print(f"Extracted {len(text)} chars, {len(tables)} tables")
-        
-        # Create schema
-        column_names = columns_param.split(',') if columns_param else analysis.columns
-        schema = ExtractionSchema(column_names)
-        
-        # Create extraction engine
-        engine = ExtractionEngine(schema, analysis)
-        
-        # Extract
-        records = engine.extract(text, tables)
-        
-        # Get headers
+        if output != 'json':
+            # Rows go straight to the exporter, no JSON body is built
+            prepared = prepare_prompt(form)
+            result, error = extract_document(file_path, filename, prepared,
+                                             resolve_pdf_workers(form.get('workers')))
+            if error:
+                return jsonify({"error": error}), 400
+            return export_response(result["records"], prepared.schema.get_headers(),
+                                   prepared.schema.get_display_headers(),
+                                   output, os.path.splitext(filename)[0])
+        
+        body, status = process_file(file_path, filename, form)
+        return jsonify(body), status
+    
+    except Exception as e:
+        error_info = {
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }
+        print(f"Error: {error_info}")
+        return jsonify(error_info), 500
+    
+    finally:
+        if file_path and os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except:
+                pass
+        gc.collect()
+
+
+@app.route('/process/stream', methods=['POST'])
+def process_document_stream():
+    """
+    Streaming variant of /process.
+    
+    Responds with NDJSON: one ``meta`` line, then a ``record`` line per
+    extracted row as soon as it is produced, then an ``end`` line (or an
+    ``error`` line). No CSV is built; clients assemble it if they need it.
+    """
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part in request"}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+    
+    prompt = request.form.get('prompt', 'Extract all relevant data')
+    columns_param = request.form.get('columns', '')
+    workers = resolve_pdf_workers(request.form.get('workers'))
+    section_param = request.form.get('section', '').strip()
+    table_engine = resolve_table_engine(request.form.get('table_engine'))
+    
+    filename = secure_filename(file.filename)
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ('.csv', '.pdf'):
+        return jsonify({"error": f"Unsupported file type: {ext}"}), 400
+    
+    # Unique on disk: the file is read lazily for the whole stream
+    file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{filename}")
+    file.save(file_path)
+    
+    plan = prompt_cache.get(prompt, columns_param.split(',') if columns_param else None, section_param)
+    analysis, column_names, schema = plan.analysis, plan.column_names, plan.schema
+    page_range = parse_page_range(request.form.get('pages') or analysis.constraints.get('page_range'))
+    engine = ExtractionEngine(schema, analysis, resolve_dedup_mode(request.form.get('dedup')))
+    
+    def ndjson(obj: Dict[str, Any]) -> str:
+        return json.dumps(obj) + "\n"
+    
+    def generate():
+        count = 0
+        pdf_stats = None
+        cache_writer = None
         headers = schema.get_headers()
-        display_headers = schema.get_display_headers()
+        try:
+            yield ndjson({
+                "type": "meta",
+                "headers": headers,
+                "display_headers": schema.get_display_headers(),
+                "metadata": {
+                    "filename": filename,
+                    "prompt": prompt,
+                    "columns": column_names,
+                    "extraction_type": analysis.extraction_type.value,
+                    "section_hint": analysis.section_hint
+                }
+            })
+            
+            cache_key = None
+            cached = None
+            if ext == '.pdf':
+                pdf_stats = {}
+                digest = file_sha256(file_path) if pdf_cache is not None else None
+                read_range = page_range
+                if digest and not read_range:
+                    cache_key = pdf_cache.key(digest, table_engine)
+                    cached = pdf_cache.get(cache_key)
+                if cached is None and not read_range and analysis.section_hint:
+                    read_range = locate_section_pages(file_path, analysis, pdf_stats, digest)
+                    if read_range and digest:
+                        # A located section is read, and cached, as a page range;
+                        # section-hint prompts extract from the joined section text
+                        # either way (see iter_extract_pages), so a hit gives the same rows
+                        cache_key = pdf_cache.page_range_key(digest, read_range, table_engine)
+                        cached = pdf_cache.get(cache_key)
+                if cached is not None:
+                    pdf_stats['cache'] = {"hit": True, **pdf_cache.stats()}
+                    records = engine.iter_extract(cached['text'], cached['tables'])
+                else:
+                    pages = open_pdf_pages(file_path, pdf_stats, workers, read_range, table_engine)
+                    if cache_key:
+                        cache_writer = pdf_cache.writer(cache_key)
+                        pages = _tee_pages(pages, cache_writer)
+                    records = engine.iter_extract_pages(pages)
+            else:
+                text, tables = extract_csv_content(file_path)
+                records = engine.iter_extract(text, tables)
+            
+            for row in records:
+                count += 1
+                yield ndjson({"type": "record", "data": dict(zip(headers, row))})
+            
+            if pdf_stats is not None and cached is None:
+                _summarize_page_stats(pdf_stats)
+                # A 'limit' constraint can stop reading early; only full reads are committed
+                if cache_writer is not None and cache_writer.committed:
+                    pdf_stats['cache'] = {"hit": False, **pdf_cache.stats()}
+            yield ndjson({
+                "type": "end",
+                "extraction_count": count,
+                "page_range": [page_range[0] + 1, page_range[1]] if page_range else None,
+                "target_pages": engine.target_pages,
+                "pdf_extraction": pdf_stats,
+                "timestamp": datetime.now().isoformat()
+            })
+        except Exception as e:
+            print(f"Stream error: {e}")
+            yield ndjson({"type": "error", "error": str(e), "extraction_count": count})
+        finally:
+            if cache_writer is not None:
+                cache_writer.discard()
+            if os.path.exists(file_path):
+                try:
+                    os.remove(file_path)
+                except:
+                    pass
+            gc.collect()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+
+@app.route('/process/batch', methods=['POST'])
+def process_batch():
+    """
+    Run one prompt over many documents (several 'files' parts and/or .zip
+    archives). The prompt is analysed and the schema built once; documents
+    are spread over ``workers`` processes. Returns one merged result with a
+    source_document column; a failing document is reported, not fatal.
+    """
+    batch_dir = None
+    try:
+        files = request.files.getlist('files') + request.files.getlist('file')
+        if not files:
+            return jsonify({"error": "No files in request"}), 400
+        
+        output = request.form.get('output') or 'json'
+        format_error = check_output_format(output)
+        if format_error:
+            return jsonify({"error": format_error}), 400
+        
+        batch_dir = tempfile.mkdtemp(prefix='batch_', dir=UPLOAD_FOLDER)
+        documents, upload_error = _save_batch_uploads(files, batch_dir)
+        if upload_error:
+            return jsonify({"error": upload_error}), 400
+        if not documents:
+            return jsonify({"error": "No usable files in request"}), 400
+        
+        prepared = prepare_prompt(request.form.to_dict())
+        workers = min(resolve_pdf_workers(request.form.get('workers')), len(documents))
+        print(f"Batch of {len(documents)} documents on {workers} workers")
+        
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [None if error else pool.submit(_extract_batch_document, path, name, prepared)
+                           for path, name, error in documents]
+                outcomes = [(None, error) if future is None else future.result()
+                            for future, (_, _, error) in zip(futures, documents)]
+        else:
+            outcomes = [(None, error) if error else _extract_batch_document(path, name, prepared)
+                        for path, name, error in documents]
         
-        # Generate CSV
-        csv_output = CSVExporter.export(records, headers, display_headers)
+        headers = ['source_document'] + prepared.schema.get_headers()
+        display_headers = ['Source Document'] + prepared.schema.get_display_headers()
         
-        # Build response
-        response = {
-            "success": True,
-            "extractions": records,
+        extractions = RecordTable(headers)
+        document_reports = []
+        for (_, name, _), (result, error) in zip(documents, outcomes):
+            if error:
+                document_reports.append({"filename": name, "success": False, "error": error})
+                continue
+            source = (name,)
+            extractions.extend(source + row for row in result["records"])
+            document_reports.append({
+                "filename": name,
+                "success": True,
+                "extraction_count": len(result["records"]),
+                "target_pages": result["target_pages"]
+            })
+        
+        if output != 'json':
+            return export_response(extractions, headers, display_headers, output, 'batch_extractions')
+        
+        failed = sum(1 for report in document_reports if not report["success"])
+        body = {
+            "success": failed < len(document_reports),
+            "extractions": extractions.to_dicts(),
             "headers": headers,
             "display_headers": display_headers,
-            "csv": csv_output,
+            "documents": document_reports,
             "metadata": {
-                "filename": filename,
-                "prompt": prompt,
-                "columns": column_names,
-                "extraction_type": analysis.extraction_type.value,
-                "section_hint": analysis.section_hint,
-                "text_length": len(text),
-                "tables_found": len(tables),
-                "extraction_count": len(records),
+                "prompt": prepared.prompt,
+                "columns": prepared.column_names,
+                "extraction_type": prepared.analysis.extraction_type.value,
+                "section_hint": prepared.analysis.section_hint,
+                "document_count": len(documents),
+                "failed_count": failed,
+                "extraction_count": len(extractions),
+                "workers": workers,
                 "timestamp": datetime.now().isoformat()
             }
         }
-        
-        print(f"Extracted {len(records)} records")
-        return jsonify(response)
+        if parse_flag(request.form.get('include_csv')):
+            body["csv"] = CSVExporter.export(extractions, headers, display_headers)
+        return jsonify(body)
     
     except Exception as e:
         error_info = {
@@ -1600,11 +3450,8 @@ def process_document():
         return jsonify(error_info), 500
     
     finally:
-        if file_path and os.path.exists(file_path):
-            try:
-                os.remove(file_path)
-            except:
-                pass
+        if batch_dir:
+            shutil.rmtree(batch_dir, ignore_errors=True)
         gc.collect()
 
 
@@ -1619,37 +3466,43 @@ def extract_from_content():
         content = data.get('content', '')
         prompt = data.get('prompt', 'Extract all relevant data')
         columns = data.get('columns', [])
+        section = data.get('section', '')
+        output = data.get('output') or 'json'
         
         if not content:
             return jsonify({"error": "No content"}), 400
         
-        # Analyze prompt
-        analyzer = PromptAnalyzer()
-        analysis = analyzer.analyze(prompt)
+        format_error = check_output_format(output)
+        if format_error:
+            return jsonify({"error": format_error}), 400
         
-        if not columns:
-            columns = analysis.columns
-        
-        schema = ExtractionSchema(columns)
-        engine = ExtractionEngine(schema, analysis)
-        
-        records = engine.extract(content, [])
+        # Analyze prompt (cached for prompts seen before)
+        plan = prompt_cache.get(prompt, columns, section)
+        analysis, schema = plan.analysis, plan.schema
+        engine = ExtractionEngine(schema, analysis, resolve_dedup_mode(data.get('dedup')))
         
         headers = schema.get_headers()
         display_headers = schema.get_display_headers()
-        csv_output = CSVExporter.export(records, headers, display_headers)
         
-        return jsonify({
+        if output != 'json':
+            # Rows are serialized as the engine yields them
+            return export_response(engine.iter_extract(content, []), headers, display_headers, output)
+        
+        records = engine.extract(content, [])
+        
+        body = {
             "success": True,
-            "extractions": records,
+            "extractions": records.to_dicts(),
             "headers": headers,
             "display_headers": display_headers,
-            "csv": csv_output,
             "metadata": {
                 "extraction_count": len(records),
                 "extraction_type": analysis.extraction_type.value
             }
-        })
+        }
+        if parse_flag(data.get('include_csv')):
+            body["csv"] = CSVExporter.export(records, headers, display_headers)
+        return jsonify(body)
     
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -1657,7 +3510,10 @@ def extract_from_content():
 
 @app.route('/export/csv', methods=['POST'])
 def export_csv():
-    """Export data as CSV."""
+    """
+    Export data as CSV. ``output`` = csv, arrow or parquet streams a file
+    instead of returning the CSV inside JSON.
+    """
     try:
         data = request.get_json()
         extractions = data.get('extractions', [])
@@ -1670,6 +3526,13 @@ def export_csv():
         if not headers:
             headers = list(extractions[0].keys())
         
+        output = data.get('output') or 'json'
+        format_error = check_output_format(output)
+        if format_error:
+            return jsonify({"error": format_error}), 400
+        if output != 'json':
+            return export_response(extractions, headers, display_headers, output)
+        
         csv_output = CSVExporter.export(extractions, headers, display_headers)
         
         return jsonify({
@@ -1682,6 +3545,52 @@ def export_csv():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/jobs/process', methods=['POST'])
+def submit_process_job():
+    """Queue a /process request; poll /jobs/<id> and fetch /jobs/<id>/result."""
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part in request"}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+    
+    filename = secure_filename(file.filename)
+    # Unique on-disk name: concurrent jobs may upload files with the same name
+    file_path = os.path.join(UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{filename}")
+    file.save(file_path)
+    
+    job_id = job_queue.submit('process', process_file, file_path, filename,
+                              request.form.to_dict(), cleanup=file_path)
+    if job_id is None:
+        os.remove(file_path)
+        response = jsonify({"error": "Job queue is full, retry later", **job_queue.stats()})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+    
+    return jsonify(_job_status_body(job_queue.get(job_id))), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(_job_status_body(job))
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """Return the finished job's response body, or 202 while it is pending."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job['status'] in ('queued', 'running'):
+        return jsonify(_job_status_body(job)), 202
+    return Response(job['result'] or '{}', status=job['http_status'] or 500,
+                    mimetype='application/json')
+
+
 # ============================================================
 # MAIN
 # ============================================================
@@ -25,6 +25,8 @@ const DEEPSEEK_MODEL = "deepseek-chat";
 // --- Python LangExtract Service Configuration ---
 // Points to the production Render service
 const PYTHON_SERVICE_URL = `https://afdmi-123.onrender.com/process`; 
+// NDJSON streaming variant of /process
+const PYTHON_STREAM_URL = `${PYTHON_SERVICE_URL}/stream`;
 
 const server = http.createServer((req, res) => {
     // FIX: Define reqUrl at the very beginning of the request handler
@@ -134,6 +136,55 @@ const server = http.createServer((req, res) => {
         }); // Correctly closed req.on('end')
     }// This closes the 'else if' for extraction
 
+    // 2b. Streaming Document Extraction (NDJSON passthrough)
+    else if (reqUrl.pathname === '/api/documents/extract/stream' && req.method === 'POST') {
+        let body = '';
+        req.on('data', chunk => body += chunk.toString());
+        req.on('end', async () => {
+            try {
+                const { documentContent, prompt, filename } = JSON.parse(body);
+                let buffer;
+                
+                if (documentContent) {
+                    buffer = Buffer.from(documentContent, 'base64');
+                } else if (filename) {
+                    const found = sessionFiles.find(f => f.filename === filename);
+                    if (found) buffer = Buffer.from(found.content, 'base64');
+                }
+
+                if (!buffer) {
+                    res.writeHead(400, { 'Content-Type': 'application/json' });
+                    return res.end(JSON.stringify({ error: 'File not found.' }));
+                }
+
+                const formData = new FormData();
+                const blob = new Blob([buffer], { type: 'application/pdf' });
+                formData.append('file', blob, filename || "doc.pdf");
+                formData.append('prompt', prompt || 'Extract data');
+
+                const pythonRes = await fetch(PYTHON_STREAM_URL, { method: 'POST', body: formData });
+
+                // Forward each chunk as it arrives instead of buffering the body
+                res.writeHead(pythonRes.status, {
+                    'Content-Type': pythonRes.headers.get('content-type') || 'application/x-ndjson',
+                    'Cache-Control': 'no-cache',
+                    'X-Accel-Buffering': 'no'
+                });
+                for await (const chunk of pythonRes.body) {
+                    res.write(chunk);
+                }
+                res.end();
+            } catch (e) {
+                if (!res.headersSent) {
+                    res.writeHead(500, { 'Content-Type': 'application/json' });
+                    res.end(JSON.stringify({ error: 'Internal Server Error' }));
+                } else {
+                    res.end(JSON.stringify({ type: 'error', error: 'Upstream stream failed' }) + '\n');
+                }
+            }
+        });
+    }
+
     // 3. User Authentication
     else if (reqUrl.pathname === '/api/signup' && req.method === 'POST') {
         // ... rest of your code ...